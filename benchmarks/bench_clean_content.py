@@ -0,0 +1,93 @@
+"""Micro-benchmark for DocsConverter.clean_content on large reference pages.
+
+Compares the single-pass cleaner against the previous implementation (one
+`select()` per excluded selector followed by a `get_text()` call per element)
+and checks that both produce identical HTML.
+
+Usage: python benchmarks/bench_clean_content.py [--sections N] [--depth D] [--repeat R]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from docs_converter import DocsConverter
+
+
+def legacy_clean_content(converter, soup):
+    """The multi-pass cleaner that clean_content replaced, kept as a baseline."""
+    for selector in converter.exclude_selectors:
+        for element in soup.select(selector):
+            element.decompose()
+
+    for element in soup.find_all(['script', 'style', 'iframe', 'noscript']):
+        element.decompose()
+
+    main_content = (
+        soup.find('main') or
+        soup.find('article') or
+        soup.find('div', {'class': ['content', 'main', 'document', 'documentation']}) or
+        soup.find('div', {'role': 'main'}) or
+        soup
+    )
+
+    for element in main_content.find_all():
+        if len(element.get_text(strip=True)) == 0:
+            element.decompose()
+
+    return main_content
+
+
+def make_page(sections, depth):
+    """Build an API-reference style page with deeply nested sections."""
+    parts = ['<html><head><title>Reference</title><script>var x = 1;</script></head><body>']
+    parts.append('<nav><ul>' + ''.join(f'<li><a href="/s{i}">S{i}</a></li>' for i in range(50)) + '</ul></nav>')
+    parts.append('<div class="sidebar"><div class="search"><input></div></div><main>')
+    for i in range(sections):
+        parts.append('<div class="section">' * depth)
+        parts.append(f'<h2 id="s{i}">Method {i}</h2><p>Returns the <code>value</code> for item {i}.</p>')
+        parts.append('<table><tr><th>Name</th><th>Type</th></tr><tr><td>id</td><td>int</td></tr>'
+                     '<tr><td><span></span></td><td></td></tr></table>')
+        parts.append(f'<pre><code class="language-python">client.method_{i}(id=1)\n</code></pre>')
+        parts.append('<div class="spacer"><span></span><img src="x.png"></div>')
+        parts.append('</div>' * depth)
+    parts.append('</main><footer>Footer</footer></body></html>')
+    return ''.join(parts)
+
+
+def time_cleaner(clean, html, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        soup = BeautifulSoup(html, 'html.parser')
+        start = time.perf_counter()
+        result = clean(soup)
+        best = min(best, time.perf_counter() - start)
+    return best, str(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark clean_content on a large synthetic page')
+    parser.add_argument('--sections', type=int, default=500, help='Number of documented methods on the page')
+    parser.add_argument('--depth', type=int, default=12, help='Nesting depth of each section')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per implementation, best time is reported')
+    args = parser.parse_args()
+
+    converter = DocsConverter('https://docs.example.com/')
+    html = make_page(args.sections, args.depth)
+
+    legacy_time, legacy_html = time_cleaner(lambda soup: legacy_clean_content(converter, soup), html, args.repeat)
+    new_time, new_html = time_cleaner(converter.clean_content, html, args.repeat)
+
+    print(f"Page size: {len(html) / 1024:.0f} KB, {args.sections} sections nested {args.depth} deep")
+    print(f"Multi-pass cleaner:  {legacy_time * 1000:8.1f} ms")
+    print(f"Single-pass cleaner: {new_time * 1000:8.1f} ms")
+    print(f"Speedup: {legacy_time / new_time:.1f}x")
+    print(f"Identical output: {legacy_html == new_html}")
+
+
+if __name__ == '__main__':
+    main()
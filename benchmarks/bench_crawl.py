@@ -0,0 +1,267 @@
+"""Offline end-to-end crawl benchmark against a synthetic documentation site.
+
+Generates a doc site with a configurable page count, page size, link fan-out and
+share of code-heavy pages, and serves it from a local HTTP server with injectable
+latency. Then runs `convert()` and `convert_all_docs()` against it, each in a fresh
+process so peak RSS is measured per run, and reports pages/sec, peak RSS and the
+time spent in each stage. `--gemini` swaps in a stub model with configurable latency
+so the Gemini path can be measured without network access or an API key.
+
+Usage: python benchmarks/bench_crawl.py [--pages N] [--page-kb K] [--fanout F]
+           [--code-ratio R] [--latency MS] [--gemini] [--json OUT] [--baseline FILE]
+
+With --baseline, exits non-zero when pages/sec drops or peak RSS grows by more than
+--tolerance relative to a previous --json result, so it can gate CI.
+"""
+import argparse
+import contextlib
+import http.server
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+MODES = ('convert_all_docs', 'convert')
+
+WORDS = ('request response client server token config value index handler option '
+         'parameter returns default example session cache query field object string').split()
+
+CODE_LINES = [
+    'client = Client(api_key=os.environ["API_KEY"])',
+    'response = client.items.list(limit=100, cursor=cursor)',
+    'for item in response.data:',
+    '    print(item.id, item.name)',
+    'if response.has_more:',
+    '    cursor = response.next_cursor',
+]
+
+
+def make_site(pages, page_kb, fanout, code_ratio, seed=0):
+    """Return a dict of URL path to HTML for a synthetic documentation site.
+
+    Pages form a tree with `fanout` children each, so every page is reachable, plus a
+    shared sidebar and a couple of cross-links per page like real docs.
+    """
+    rng = random.Random(seed)
+    sidebar = ''.join(f'<li><a href="/docs/page-{i}.html">Page {i}</a></li>' for i in range(min(pages, 30)))
+    site = {}
+    for i in range(pages):
+        children = range(i * fanout + 1, min(pages, i * fanout + fanout + 1))
+        links = [f'/docs/page-{j}.html' for j in children]
+        links += [f'/docs/page-{rng.randrange(pages)}.html' for _ in range(2)]
+        code_heavy = rng.random() < code_ratio
+
+        body = [f'<h1>Page {i}</h1>']
+        size = 0
+        section = 0
+        while size < page_kb * 1024:
+            section += 1
+            text = ' '.join(rng.choice(WORDS) for _ in range(60))
+            block = f'<h2>Section {section}</h2><p>{text}</p>'
+            if code_heavy or section % 3 == 0:
+                code = '\n'.join(rng.choice(CODE_LINES) for _ in range(12))
+                block += f'<pre><code class="language-python">{code}</code></pre>'
+            if section % 4 == 0:
+                block += ('<table><tr><th>Name</th><th>Type</th></tr>'
+                          + ''.join(f'<tr><td>{rng.choice(WORDS)}</td><td>string</td></tr>' for _ in range(5))
+                          + '</table>')
+            body.append(block)
+            size += len(block)
+        body.append('<ul>' + ''.join(f'<li><a href="{link}">{link}</a></li>' for link in links) + '</ul>')
+
+        html = (f'<!DOCTYPE html><html><head><title>Page {i}</title></head><body>'
+                f'<header><a href="/docs/">Docs</a></header><nav class="sidebar"><ul>{sidebar}</ul></nav>'
+                f'<main>{"".join(body)}</main><footer>Footer</footer></body></html>')
+        site[f'/docs/page-{i}.html'] = html.encode('utf-8')
+    site['/docs/'] = site['/docs/page-0.html']
+    return site
+
+
+def serve_site(site, latency=0.0, jitter=0.0):
+    """Serve the site on a free localhost port, sleeping `latency` (+ up to `jitter`) seconds per request."""
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if latency or jitter:
+                time.sleep(latency + random.uniform(0, jitter))
+            path = self.path.split('?', 1)[0]
+            if path == '/docs':
+                path = '/docs/'
+            body = site.get(path)
+            if body is None:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class StubGeminiModel:
+    """Stands in for `genai.GenerativeModel`: waits `latency` seconds and echoes the prompt."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        return SimpleNamespace(text=prompt)
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_child(args):
+    """Run one conversion against the fixture server and print its measurements as JSON."""
+    from docs_converter import DocsConverter
+
+    converter = DocsConverter(
+        f'http://127.0.0.1:{args.port}/docs/',
+        concurrency=args.concurrency,
+        max_rps=args.max_rps,
+        host_concurrency=args.concurrency,
+        workers=args.workers,
+        checkpoint_interval=0,
+        gemini_rpm=args.gemini_rpm,
+    )
+    if args.gemini:
+        converter.model = StubGeminiModel(args.gemini_latency / 1000)
+
+    os.chdir(tempfile.mkdtemp(prefix='bench_crawl_'))
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if args.child == 'convert':
+            converter.convert()
+        else:
+            converter.convert_all_docs()
+    elapsed = time.perf_counter() - start
+
+    snapshot = converter.metrics.snapshot()
+    pages = snapshot['counters'].get('pages_converted', 0)
+    print(json.dumps({
+        'mode': args.child,
+        'pages': pages,
+        'seconds': elapsed,
+        'pages_per_sec': pages / elapsed,
+        'peak_rss_mb': peak_rss_mb(),
+        'peak_worker_rss_mb': peak_rss_mb(resource.RUSAGE_CHILDREN),  # Largest render worker, if any
+        'bytes_fetched': snapshot['counters'].get('bytes_fetched', 0),
+        'stages': {name: stats['seconds'] for name, stats in snapshot['stages'].items()},
+    }))
+
+
+def check_baseline(results, baseline_path, tolerance):
+    """Return the regressions of `results` against a previous --json output."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {result['mode']: result for result in json.load(f)['results']}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['mode'])
+        if not previous:
+            continue
+        if result['pages_per_sec'] < previous['pages_per_sec'] * (1 - tolerance):
+            regressions.append(f"{result['mode']}: {result['pages_per_sec']:.1f} pages/sec, "
+                               f"baseline {previous['pages_per_sec']:.1f}")
+        if result['peak_rss_mb'] > previous['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{result['mode']}: peak RSS {result['peak_rss_mb']:.0f} MB, "
+                               f"baseline {previous['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline crawl and conversion benchmark')
+    parser.add_argument('--pages', type=int, default=200, help='Pages in the synthetic site')
+    parser.add_argument('--page-kb', type=float, default=20, help='Approximate main content size per page in KB')
+    parser.add_argument('--fanout', type=int, default=5, help='Child links per page')
+    parser.add_argument('--code-ratio', type=float, default=0.3, help='Share of pages where every section has a code block')
+    parser.add_argument('--latency', type=float, default=20, help='Server latency per request in ms')
+    parser.add_argument('--jitter', type=float, default=0, help='Extra random latency per request, up to this many ms')
+    parser.add_argument('--concurrency', type=int, default=8, help='Converter fetch concurrency')
+    parser.add_argument('--max-rps', type=float, default=0, help='Converter per-host rate limit, 0 for none')
+    parser.add_argument('--workers', type=int, help='Render worker processes')
+    parser.add_argument('--gemini', action='store_true', help='Run the Gemini path with a stub model')
+    parser.add_argument('--gemini-latency', type=float, default=200, help='Stub Gemini latency per request in ms')
+    parser.add_argument('--gemini-rpm', type=float, default=0, help='Converter Gemini rate limit, 0 for none')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES), help='Conversions to run')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--baseline', help='Compare against a previous --json file and fail on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative regression (default: 0.2)')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    site = make_site(args.pages, args.page_kb, args.fanout, args.code_ratio)
+    server = serve_site(site, args.latency / 1000, args.jitter / 1000)
+    site_mb = sum(len(body) for body in site.values()) / 1024 / 1024
+    print(f"Serving {args.pages} pages ({site_mb:.1f} MB) with {args.latency:.0f} ms latency")
+
+    child_args = [
+        sys.executable, __file__, '--port', str(server.server_address[1]),
+        '--concurrency', str(args.concurrency), '--max-rps', str(args.max_rps),
+        '--gemini-latency', str(args.gemini_latency), '--gemini-rpm', str(args.gemini_rpm),
+    ]
+    if args.workers:
+        child_args += ['--workers', str(args.workers)]
+    if args.gemini:
+        child_args.append('--gemini')
+
+    results = []
+    try:
+        for mode in args.modes:
+            output = subprocess.run(child_args + ['--child', mode], capture_output=True, text=True, check=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        server.shutdown()
+
+    for result in results:
+        print(f"\n{result['mode']}: {result['pages']} pages in {result['seconds']:.2f}s, "
+              f"{result['pages_per_sec']:.1f} pages/sec, peak RSS {result['peak_rss_mb']:.0f} MB")
+        for name, seconds in sorted(result['stages'].items(), key=lambda item: -item[1]):
+            print(f"  {name:<18}{seconds:>8.2f}s")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': {key: value for key, value in vars(args).items()
+                                    if key not in ('child', 'port', 'json', 'baseline')},
+                       'results': results}, f, indent=2)
+
+    if args.baseline:
+        regressions = check_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\nPerformance regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
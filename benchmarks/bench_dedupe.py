@@ -0,0 +1,107 @@
+"""Detection check and benchmark for the near-duplicate index used by --dedupe.
+
+Builds documentation-like pages and variants of them that should count as the same
+page (a changed version string, date or footer, a re-served copy), plus sibling
+pages that share the page template but not the content, which must not match.
+Reports how often each kind of variant is caught, the catch rate for random word
+edits, and how long fingerprinting takes.
+
+Usage: python benchmarks/bench_dedupe.py [--trials N] [--threshold T]
+
+Exits non-zero when a realistic variant is missed or a sibling page is reported
+as a duplicate.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from docs_converter import DuplicateIndex
+
+COMMON_WORDS = ('the', 'a', 'to', 'of', 'and', 'is', 'in', 'for', 'with', 'you', 'this', 'that',
+                'can', 'be', 'on', 'returns', 'value', 'request', 'client', 'default', 'set', 'use')
+
+
+def make_vocabulary(rng, size=4000):
+    return [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 10)))
+            for _ in range(size)]
+
+
+def make_body(rng, vocabulary, words):
+    """Prose-like text: frequent function words mixed with a long tail of terms."""
+    return ' '.join(rng.choice(COMMON_WORDS) if rng.random() < 0.4 else rng.choice(vocabulary)
+                    for _ in range(words))
+
+
+def make_page(body, version='2.3.1', date='March 3, 2024', footer='Was this page helpful? Edit this page on GitHub'):
+    return (f"Example SDK {version} documentation. {body} "
+            f"Last updated on {date}. {footer}. Copyright Example Inc.")
+
+
+VARIANTS = {
+    'same content': lambda body: make_page(body),
+    'version string': lambda body: make_page(body, version='2.4.0'),
+    'date': lambda body: make_page(body, date='July 21, 2025'),
+    'footer': lambda body: make_page(body, footer='Report a problem with this page or ask on the forum'),
+}
+
+
+def edit_words(rng, vocabulary, text, count):
+    words = text.split()
+    for position in rng.sample(range(len(words)), count):
+        words[position] = rng.choice(vocabulary) + 'x'
+    return ' '.join(words)
+
+
+def matches(index, original, variant):
+    index.add(0, 'https://docs.example.com/a', 'A', index.fingerprint(original))
+    return index.find_original(index.fingerprint(variant), 1) is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check near-duplicate detection for --dedupe')
+    parser.add_argument('--trials', type=int, default=50, help='Pages per page size and variant')
+    parser.add_argument('--threshold', type=float, default=DuplicateIndex().threshold,
+                        help='Jaccard threshold of the index (default: the converter default)')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    vocabulary = make_vocabulary(rng)
+    failures = 0
+    for words in (200, 500, 1500):
+        bodies = [make_body(rng, vocabulary, words) for _ in range(args.trials)]
+        results = []
+        for name, variant in VARIANTS.items():
+            caught = sum(matches(DuplicateIndex(args.threshold), make_page(body), variant(body)) for body in bodies)
+            failures += caught < len(bodies)
+            results.append(f"{name} {caught}/{len(bodies)}")
+
+        # Sibling pages share the header and footer but not the body
+        siblings = sum(matches(DuplicateIndex(args.threshold), make_page(body), make_page(other))
+                       for body, other in zip(bodies, bodies[1:]))
+        failures += siblings > 0
+        results.append(f"siblings matched {siblings}/{len(bodies) - 1}")
+
+        edits = []
+        for count in (1, 3, 10, 30):
+            caught = sum(matches(DuplicateIndex(args.threshold), make_page(body),
+                                 edit_words(rng, vocabulary, make_page(body), count)) for body in bodies)
+            edits.append(f"{count}: {caught * 100 // len(bodies)}%")
+
+        text = make_page(bodies[0])
+        index = DuplicateIndex(args.threshold)
+        start = time.perf_counter()
+        for _ in range(10):
+            index.fingerprint(text)
+        print(f"{words:5} words: {', '.join(results)}")
+        print(f"{'':12} word edits caught: {', '.join(edits)}; "
+              f"fingerprint {(time.perf_counter() - start) * 100:.2f} ms")
+
+    print(f"Detection: {'OK' if not failures else f'{failures} failing checks'}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark for the crawl frontier, the visited-URL set and link filtering.
+
+Reports the memory each visited-set implementation and the frontier take per URL,
+compared with the plain `set` of strings and deque of tuples they replaced, and how
+many links per second `filter_links` resolves with and without the per-href cache.
+
+Usage: python benchmarks/bench_frontier.py [--urls N] [--pages P]
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from docs_converter import BloomFilter, DocsConverter, Frontier, UrlSet
+
+BASE_URL = 'https://docs.example.com/docs'
+
+
+def make_url(i):
+    return f"{BASE_URL}/section-{i % 97}/topic-{i % 1013}/page-{i}"
+
+
+def measure(build, count):
+    """Return the bytes per URL still allocated by the object `build` returns."""
+    tracemalloc.start()
+    result = build()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return current / count
+
+
+def make_site(pages, links_per_page):
+    """Generate (page URL, hrefs) pairs with shared navigation and page-local links."""
+    rng = random.Random(0)
+    nav = [f"/docs/section-{s}/topic-{t}/page-{s * 31 + t}" for s in range(20) for t in range(5)]
+    site = []
+    for i in range(pages):
+        page_url = make_url(i)
+        hrefs = list(nav)
+        for _ in range(links_per_page - len(nav)):
+            j = rng.randrange(pages * 4)
+            hrefs.append(rng.choice([
+                f"page-{j}",
+                f"../topic-{j % 1013}/page-{j}",
+                f"{make_url(j)}#section",
+                f"/docs/section-{j % 97}/topic-{j % 1013}/page-{j}/",
+                f"https://other.example.org/page-{j}",
+                "#top",
+            ]))
+        site.append((page_url, hrefs))
+    return site
+
+
+def links_per_second(converter, site, repeat=3):
+    total = sum(len(hrefs) for _, hrefs in site)
+    best = float('inf')
+    for _ in range(repeat):
+        converter._link_cache.clear()
+        start = time.perf_counter()
+        for page_url, hrefs in site:
+            converter.filter_links(hrefs, page_url)
+        best = min(best, time.perf_counter() - start)
+    return total / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark frontier memory and link filtering throughput')
+    parser.add_argument('--urls', type=int, default=200_000, help='URLs in the visited set and frontier')
+    parser.add_argument('--pages', type=int, default=500, help='Pages of links to filter')
+    args = parser.parse_args()
+    n = args.urls
+
+    print(f"Memory per URL ({n} URLs)")
+    rows = [
+        ('Visited set[str]', lambda: {make_url(i) for i in range(n)}),
+        ('Visited UrlSet (64-bit keys)', lambda: UrlSet(make_url(i) for i in range(n))),
+        ('Visited BloomFilter (p=0.001)', lambda: BloomFilter(n, 0.001, (make_url(i) for i in range(n)))),
+        ('Visited BloomFilter (p=0.01)', lambda: BloomFilter(n, 0.01, (make_url(i) for i in range(n)))),
+        ('Queue deque[(url, depth)]', lambda: deque((make_url(i), i * 8 // n) for i in range(n))),
+        ('Queue Frontier', lambda: Frontier((make_url(i), i * 8 // n) for i in range(n))),
+    ]
+    for name, build in rows:
+        print(f"  {name:32s} {measure(build, n):7.1f} bytes")
+
+    bloom = BloomFilter(n, 0.01, (make_url(i) for i in range(n)))
+    false_positives = sum(make_url(i) in bloom for i in range(n, 2 * n))
+    print(f"  Bloom filter (p=0.01) measured false-positive rate: {false_positives / n:.4f}")
+
+    site = make_site(args.pages, 200)
+    uncached = DocsConverter(BASE_URL, link_cache_size=0)
+    cached = DocsConverter(BASE_URL)
+    matches = all(uncached.filter_links(hrefs, url) == cached.filter_links(hrefs, url) for url, hrefs in site)
+    print(f"\nLink filtering ({args.pages} pages, 200 links each)")
+    print(f"  Without parse cache: {links_per_second(uncached, site):10,.0f} links/sec")
+    print(f"  With parse cache:    {links_per_second(cached, site):10,.0f} links/sec")
+    print(f"  Identical links: {matches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Parity check and benchmark for the HTML parser backends.
+
+Renders every page of a corpus with each available backend and reports how
+long parse_page (parsing, cleaning and link extraction) and the whole render
+took, and whether the post-processed markdown and links match the html.parser
+output exactly.
+
+Usage: python benchmarks/bench_parsers.py [--pages DIR] [--repeat R] [--update-golden]
+
+By default the corpus is a few synthetic reference pages plus the saved pages
+in benchmarks/parser_corpus: Sphinx, MkDocs and GitHub pages that omit optional
+end tags, an old manual with uppercase, misnested and stray tags, and a
+truncated download. The html.parser rendering of each saved page is also
+checked against parser_corpus/expected/NAME.md.
+
+Every page where a backend's output differs from html.parser is reported with
+a diff. Pages listed in MALFORMED_PAGES have broken markup that each parser
+recovers from in its own way, so their divergence is reported but expected;
+any other divergence fails the run.
+"""
+import argparse
+import difflib
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from docs_converter import DocsConverter, PARSER_BACKENDS
+from bench_clean_content import make_page
+
+CORPUS_DIR = Path(__file__).resolve().parent / 'parser_corpus'
+URL = 'https://docs.example.com/docs/page'
+# Saved pages whose markup is broken rather than just terse, with what breaks it
+MALFORMED_PAGES = {
+    'truncated_download.html': 'the download stops inside an unclosed <a> that spans a list',
+}
+
+
+def synthetic_corpus():
+    pages = {f'reference_{n}.html': make_page(n, 6) for n in (10, 100, 400)}
+    pages['guide.html'] = (
+        '<!DOCTYPE html><html><head><title>Guide</title><meta property="og:title" content="Guide">'
+        '<style>body { color: red; }</style></head><body><header><h1>Site</h1></header>'
+        '<div class="sidebar"><a href="/docs/a">A</a><a href="/docs/b">B</a></div>'
+        '<article><h1>Getting started</h1><p>Install with <code>pip install x</code> &amp; run it.</p>'
+        '<a href="/docs/icon"><img src="icon.svg"></a><a href="/docs/next">Next&nbsp;page</a>'
+        '<ul><li>One</li><li></li><li><a href="#anchor">Two</a></li></ul>'
+        '<!-- comment --><pre><code>x = 1\n</code></pre></article>'
+        '<footer><a href="/docs/legal">Legal</a></footer></body></html>'
+    )
+    return pages
+
+
+def read_pages(directory):
+    return {path.name: path.read_text(encoding='utf-8', errors='replace')
+            for path in sorted(Path(directory).glob('*.html'))}
+
+
+def render(converter, html, url):
+    """Return the markdown and links of a page, post-processed in line mode as the server writes them.
+
+    Line mode keeps tables and lists intact, so differences between the backends stay visible.
+    """
+    section, links = converter.render_markdown(html, url, exclude_visited=False)
+    return converter.post_process_markdown(section, line_mode=True), links
+
+
+def golden_text(output):
+    markdown, links = output
+    return markdown + '\n\n<!-- links:\n' + '\n'.join(links) + '\n-->\n'
+
+
+def expected_path(name):
+    return CORPUS_DIR / 'expected' / f'{Path(name).stem}.md'
+
+
+def print_divergence(backend, name, output, reference, max_lines=12):
+    note = MALFORMED_PAGES.get(name)
+    print(f"{'DIVERGES' if note else 'MISMATCH'} {backend}: {name}" + (f" (expected, {note})" if note else ''))
+    diff = difflib.unified_diff(golden_text(reference).splitlines(), golden_text(output).splitlines(),
+                                'html.parser', backend, lineterm='', n=0)
+    for line in list(diff)[2:max_lines + 2]:
+        print(f"    {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check markdown parity and speed across parser backends')
+    parser.add_argument('--pages', help='Directory of saved .html pages (default: synthetic and saved corpus)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per page and backend, best time is reported')
+    parser.add_argument('--update-golden', action='store_true',
+                        help='Rewrite parser_corpus/expected from the current output and exit')
+    args = parser.parse_args()
+
+    saved = read_pages(args.pages or CORPUS_DIR)
+    pages = dict(saved) if args.pages else {**synthetic_corpus(), **saved}
+
+    outputs = {}
+    for backend in PARSER_BACKENDS:
+        converter = DocsConverter('https://docs.example.com/docs', parser_backend=backend)
+        if converter.parser_backend != backend:
+            continue
+        outputs[backend] = {}
+        parse_total = render_total = 0.0
+        for name, html in pages.items():
+            best_parse = best_render = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                converter.parse_page(html, URL, exclude_visited=False)
+                best_parse = min(best_parse, time.perf_counter() - start)
+                start = time.perf_counter()
+                output = render(converter, html, URL)
+                best_render = min(best_render, time.perf_counter() - start)
+            parse_total += best_parse
+            render_total += best_render
+            outputs[backend][name] = output
+        print(f"{backend:12} parse {parse_total * 1000:8.1f} ms, render {render_total * 1000:8.1f} ms "
+              f"for {len(pages)} pages")
+
+    reference = outputs['html.parser']
+    if args.update_golden:
+        (CORPUS_DIR / 'expected').mkdir(exist_ok=True)
+        for name in saved:
+            expected_path(name).write_text(golden_text(reference[name]), encoding='utf-8')
+        print(f"Wrote expected outputs for {len(saved)} pages to {CORPUS_DIR / 'expected'}")
+        return
+
+    failures = expected_divergences = 0
+    if not args.pages:
+        for name in saved:
+            path = expected_path(name)
+            if not path.exists() or path.read_text(encoding='utf-8') != golden_text(reference[name]):
+                failures += 1
+                print(f"MISMATCH html.parser: {name} differs from {path.relative_to(CORPUS_DIR.parent)}")
+    for backend, results in outputs.items():
+        for name, output in results.items():
+            if output != reference[name]:
+                print_divergence(backend, name, output, reference[name])
+                if name in MALFORMED_PAGES:
+                    expected_divergences += 1
+                else:
+                    failures += 1
+
+    summary = 'OK' if not failures else f'{failures} mismatching pages'
+    if expected_divergences:
+        summary += f", {expected_divergences} expected divergences on malformed pages"
+    print(f"Parity: {summary}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
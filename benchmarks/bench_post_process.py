@@ -0,0 +1,136 @@
+"""Benchmark for DocsConverter.post_process_markdown on a large document.
+
+Times the previous implementation (about 20 uncompiled re.sub passes), the
+compiled and fused regex passes, and the line-oriented mode. Also checks that
+the regex mode produces exactly the same output as the previous implementation.
+
+Before timing, both modes are checked against the golden files in
+post_process_corpus/: each `NAME.md` input has the expected output of each mode in
+`expected/NAME.regex.md` and `expected/NAME.line.md`. Inputs named `toc_*` are
+processed with `generate_toc=True`. After an intended change, regenerate the
+expected files with --update-golden and review the diff.
+
+Usage: python benchmarks/bench_post_process.py [--pages N] [--repeat R] [--update-golden]
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+from markdownify import markdownify as md
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from docs_converter import DocsConverter
+from bench_clean_content import make_page
+
+CORPUS_DIR = Path(__file__).resolve().parent / 'post_process_corpus'
+MODES = {'regex': False, 'line': True}
+
+
+def legacy_post_process_markdown(content, generate_toc=False):
+    """The uncompiled multi-pass implementation post_process_markdown replaced, kept as a baseline."""
+    if not content:
+        return content
+
+    content = re.sub(r'\\\-', '-', content)
+    content = re.sub(r'\\\|', '|', content)
+    content = re.sub(r'\\([#\[\]\(\)\*\_\~])', r'\1', content)
+    content = re.sub(r'\n{3,}', '\n\n', content)
+    content = re.sub(r'\[([^\]]+)\]\(([^\)]+)\)', lambda m: f'[{m.group(1).strip()}](#)', content)
+    content = re.sub(r'```\s*(\w+)\s*\n', r'```\1\n', content)
+    content = re.sub(r'```\n\n+', '```\n', content)
+    content = re.sub(r'\n\n+```', '\n```', content)
+    content = re.sub(r'^(\s*[-\*\+])\s+', r'\1 ', content, flags=re.MULTILINE)
+    content = re.sub(r'(\n\s*[-\*\+] [^\n]+)(\n\s*[-\*\+])', r'\1\n\2', content)
+    content = re.sub(r'\|\s+\|', '|', content)
+    content = re.sub(r'\s+\|', ' |', content)
+    content = re.sub(r'\|\s+', '| ', content)
+    content = re.sub(r'^(#+)([^#\s])', r'\1 \2', content, flags=re.MULTILINE)
+    content = re.sub(r'^(#+\s.*?)#+\s*$', r'\1', content, flags=re.MULTILINE)
+
+    if generate_toc:
+        headers = []
+        for line in content.split('\n'):
+            if line.startswith('#'):
+                level = len(re.match(r'^#+', line).group())
+                title = line.lstrip('#').strip()
+                if level <= 3:
+                    anchor = re.sub(r'[^\w\- ]', '', title.lower()).replace(' ', '-')
+                    headers.append((level, title, anchor))
+
+        if headers:
+            toc = ['# Table of Contents\n']
+            for level, title, anchor in headers:
+                indent = '  ' * (level - 1)
+                toc.append(f'{indent}- [{title}](#{anchor})')
+
+            first_heading_end = content.find('\n', content.find('#'))
+            if first_heading_end != -1:
+                content = content[:first_heading_end + 1] + '\n' + '\n'.join(toc) + '\n\n' + content[first_heading_end + 1:]
+
+    return content.strip()
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def check_golden(converter, update=False):
+    """Compare both modes with the expected outputs in CORPUS_DIR and return the mismatching files."""
+    expected_dir = CORPUS_DIR / 'expected'
+    expected_dir.mkdir(exist_ok=True)
+    mismatches = []
+    for source in sorted(CORPUS_DIR.glob('*.md')):
+        content = source.read_text(encoding='utf-8')
+        for mode, line_mode in MODES.items():
+            output = converter.post_process_markdown(content, source.name.startswith('toc_'), line_mode=line_mode) + '\n'
+            expected_path = expected_dir / f"{source.stem}.{mode}.md"
+            if update:
+                expected_path.write_text(output, encoding='utf-8')
+            elif not expected_path.exists() or expected_path.read_text(encoding='utf-8') != output:
+                mismatches.append(expected_path.name)
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark post_process_markdown on a large document')
+    parser.add_argument('--pages', type=int, default=20, help='Number of converted reference pages in the document')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per implementation, best time is reported')
+    parser.add_argument('--update-golden', action='store_true', help='Rewrite the expected outputs of the golden corpus')
+    args = parser.parse_args()
+
+    converter = DocsConverter('https://docs.example.com/')
+    mismatches = check_golden(converter, update=args.update_golden)
+    if args.update_golden:
+        print(f"Updated the expected outputs in {CORPUS_DIR / 'expected'}")
+        return
+    elif mismatches:
+        print(f"Golden corpus: {len(mismatches)} mismatching outputs: {', '.join(mismatches)}")
+        sys.exit(1)
+    else:
+        print("Golden corpus: both modes match the expected outputs")
+    page = md(make_page(200, 2))
+    document = '\n\n---\n\n'.join(f'## Page {i}\n\n{page}' for i in range(args.pages))
+
+    print(f"Document size: {len(document) / 1024:.0f} KB")
+    for toc in (False, True):
+        legacy_time, legacy_output = best_time(lambda: legacy_post_process_markdown(document, toc), args.repeat)
+        regex_time, regex_output = best_time(lambda: converter.post_process_markdown(document, toc), args.repeat)
+        line_time, _ = best_time(lambda: converter.post_process_markdown(document, toc, line_mode=True), args.repeat)
+
+        print(f"\ngenerate_toc={toc}")
+        print(f"Uncompiled passes:  {legacy_time * 1000:8.1f} ms")
+        print(f"Compiled passes:    {regex_time * 1000:8.1f} ms  ({legacy_time / regex_time:.1f}x)")
+        print(f"Line mode:          {line_time * 1000:8.1f} ms  ({legacy_time / line_time:.1f}x)")
+        print(f"Regex mode identical to previous output: {legacy_output == regex_output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Cold-start benchmark for importing the converter and the web server.
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters and reports
+the median cumulative import time of each module, its slowest dependencies, and
+whether any of the heavy dependencies that should only load on first use
+(the Gemini SDK, markdownify, bs4, jinja2) were imported anyway.
+
+Usage: python benchmarks/bench_startup.py [--repeat N] [--top K] [--json OUT] [--baseline FILE]
+
+With --baseline, exits non-zero when an import gets slower by more than --tolerance
+relative to a previous --json result, or when a lazy dependency is imported eagerly.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODULES = ('docs_converter', 'server')
+# Dependencies each module should leave to first use (Flask needs jinja2 for the server)
+LAZY_MODULES = {
+    'docs_converter': ('google.generativeai', 'markdownify', 'bs4', 'jinja2'),
+    'server': ('google.generativeai', 'markdownify', 'bs4'),
+}
+
+
+def import_times(module):
+    """Import `module` in a fresh interpreter and return `{imported module: cumulative µs}`."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            # The same module can't be imported twice, indentation shows nesting only
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module, repeat):
+    # Modules the interpreter itself imports at startup (site, encodings, ...) aren't dependencies
+    startup = set(import_times('sys'))
+    runs = [import_times(module) for _ in range(repeat)]
+    last = runs[-1]
+    top_level = [name for name in last if '.' not in name and name != module and name not in startup]
+    return {
+        'module': module,
+        'ms': statistics.median(run[module] for run in runs) / 1000,
+        'dependencies': sorted(((name, last[name] / 1000) for name in top_level), key=lambda item: -item[1]),
+        'eager_lazy_modules': [name for name in LAZY_MODULES.get(module, ()) if name in last],
+    }
+
+
+def check_baseline(results, baseline_path, tolerance):
+    """Return the regressions of `results` against a previous --json output."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {result['module']: result for result in json.load(f)['results']}
+    regressions = []
+    for result in results:
+        if result['eager_lazy_modules']:
+            regressions.append(f"{result['module']}: imports {', '.join(result['eager_lazy_modules'])} eagerly")
+        previous = baseline.get(result['module'])
+        if previous and result['ms'] > previous['ms'] * (1 + tolerance):
+            regressions.append(f"{result['module']}: {result['ms']:.0f} ms, baseline {previous['ms']:.0f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold import time of the converter and server')
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per module, the median is reported')
+    parser.add_argument('--top', type=int, default=8, help='Slowest top-level dependencies to list')
+    parser.add_argument('--modules', nargs='+', default=list(MODULES), help='Modules to import')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--baseline', help='Compare against a previous --json file and fail on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='Allowed relative slowdown (default: 0.3)')
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        try:
+            result = measure(module, args.repeat)
+        except subprocess.CalledProcessError as e:
+            print(f"{module}: import failed\n{e.stderr.strip().splitlines()[-1]}")
+            continue
+        results.append(result)
+        print(f"\nimport {module}: {result['ms']:.1f} ms (median of {args.repeat})")
+        for name, ms in result['dependencies'][:args.top]:
+            print(f"  {name:<24}{ms:>8.1f} ms")
+        if result['eager_lazy_modules']:
+            print(f"  Imported eagerly: {', '.join(result['eager_lazy_modules'])}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': {'repeat': args.repeat}, 'results': results}, f, indent=2)
+
+    if args.baseline:
+        regressions = check_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\nStartup regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
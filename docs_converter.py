@@ -1,24 +1,1151 @@
 import requests
-from bs4 import BeautifulSoup
-from markdownify import markdownify as md
+from requests.adapters import HTTPAdapter
 import os
 from urllib.parse import urljoin, urlparse, unquote
 import time
 import re
 import argparse
-from collections import deque
-import google.generativeai as genai
+import cProfile
+import gzip
+import hashlib
+import io
+import math
+import operator
+import pstats
+import sqlite3
+import threading
+import zlib
+from array import array
+import xml.etree.ElementTree as ET
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import lru_cache, partial
 import json
-from jinja2 import Environment, FileSystemLoader
+import random
+import shutil
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
 
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+MAX_RETRY_AFTER = 600  # Cap on a server-requested pause, in seconds
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+GEMINI_API_URL = 'https://generativelanguage.googleapis.com'
+GEMINI_MODEL_NAME = 'gemini-1.5-flash-002'
+FENCE_RE = re.compile(r'^\s*(`{3,}|~{3,})')
+CHUNK_HEADING_RE = re.compile(r'#{1,2}\s')
+SIMPLE_SELECTOR_RE = re.compile(r'^([.#]?)([\w-]+)$')
+ALWAYS_EXCLUDED_TAGS = {'script', 'style', 'iframe', 'noscript'}
+MAIN_CONTENT_CLASSES = {'content', 'main', 'document', 'documentation'}
+PARSER_BACKENDS = ('html.parser', 'lxml', 'selectolax')
+# Start tags that close an open element whose end tag HTML lets pages omit, as
+# `tag: (elements closed, elements that stop the search)`. Sphinx and MkDocs leave out
+# `</li>`, `</p>` and `</td>`; html.parser would nest the following items inside them.
+_SCOPE_TAGS = {'applet', 'caption', 'html', 'table', 'td', 'th', 'marquee', 'object', 'template'}
+_LIST_ITEM_SCOPE = _SCOPE_TAGS | {'body', 'ol', 'ul', 'menu', 'dl', 'blockquote', 'section', 'article', 'aside',
+                                  'nav', 'main', 'header', 'footer', 'details', 'fieldset', 'figure', 'form',
+                                  'button', 'select', 'center', 'dir', 'listing', 'pre', 'xmp'}
+_IMPLIED_END_TAGS = {
+    'li': ({'li'}, _LIST_ITEM_SCOPE),
+    'dt': ({'dt', 'dd'}, _LIST_ITEM_SCOPE),
+    'dd': ({'dt', 'dd'}, _LIST_ITEM_SCOPE),
+    'tr': ({'tr'}, {'table', 'tbody', 'thead', 'tfoot', 'template', 'html'}),
+    'td': ({'td', 'th'}, {'tr', 'table', 'template', 'html'}),
+    'th': ({'td', 'th'}, {'tr', 'table', 'template', 'html'}),
+    'tbody': ({'tbody', 'thead', 'tfoot'}, {'table', 'template', 'html'}),
+    'thead': ({'tbody', 'thead', 'tfoot'}, {'table', 'template', 'html'}),
+    'tfoot': ({'tbody', 'thead', 'tfoot'}, {'table', 'template', 'html'}),
+    'option': ({'option'}, {'select', 'datalist', 'optgroup', 'html'}),
+    'optgroup': ({'optgroup', 'option'}, {'select', 'html'}),
+}
+_HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+_PARAGRAPH_SCOPE = _SCOPE_TAGS | {'button'}
+# Block start tags that end an open paragraph
+_PARAGRAPH_CLOSING_TAGS = _HEADING_TAGS | {
+    'address', 'article', 'aside', 'blockquote', 'center', 'details', 'dialog', 'dir', 'div', 'dl',
+    'fieldset', 'figcaption', 'figure', 'footer', 'form', 'header', 'hgroup', 'hr', 'listing', 'main',
+    'menu', 'nav', 'ol', 'p', 'plaintext', 'pre', 'search', 'section', 'summary', 'table', 'ul', 'xmp',
+    'li', 'dd', 'dt'}
+PROMPTS_DIR = Path(__file__).parent / 'templates' / 'prompts'
+
+# Patterns used by post_process_markdown, compiled once
+ESCAPED_CHAR_RE = re.compile(r'\\([-|#\[\]()*_~])')
+EXTRA_NEWLINES_RE = re.compile(r'\n{3,}')
+LINK_RE = re.compile(r'\[([^\]]+)\]\(([^\)]+)\)')
+FENCE_LANGUAGE_RE = re.compile(r'```\s*(\w+)\s*\n')
+FENCE_OPENING_BLANK_RE = re.compile(r'```\n\n+')
+FENCE_CLOSING_BLANK_RE = re.compile(r'\n\n+```')
+LIST_MARKER_RE = re.compile(r'^(\s*[-\*\+])\s+', re.MULTILINE)
+LIST_ITEM_PAIR_RE = re.compile(r'(\n\s*[-\*\+] [^\n]+)(\n\s*[-\*\+])')
+TABLE_EMPTY_CELL_RE = re.compile(r'\|\s+\|')
+TABLE_PIPE_BEFORE_RE = re.compile(r'\s+\|')
+TABLE_PIPE_AFTER_RE = re.compile(r'\|\s+')
+# Heading patterns start with a literal '#' (the lookbehind anchors it to the start of a line)
+# so the regex engine can skip straight to candidates instead of trying every line start.
+HEADING_SPACE_RE = re.compile(r'#(?<![^\n]#)(#*)([^#\s])')
+HEADING_TRAILING_RE = re.compile(r'#(?<![^\n]#)(#*\s.*?)#+\s*$', re.MULTILINE)
+HEADING_LEVEL_RE = re.compile(r'^#+')
+ANCHOR_CHARS_RE = re.compile(r'[^\w\- ]')
+CANONICAL_LINK_RE = re.compile(r'<link\b[^>]*\brel\s*=\s*["\']?canonical\b[^>]*>', re.IGNORECASE)
+HREF_ATTR_RE = re.compile(r'\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.IGNORECASE)
+WORD_RE = re.compile(r'\w+')
+MARKDOWN_HEADING_RE = re.compile(r'(#{1,6})[ \t]+(.+?)(?:[ \t]+#+)?[ \t]*$')
+SETEXT_UNDERLINE_RE = re.compile(r'(=+|-+)[ \t]*$')
+HEADING_LINE_RE = re.compile(r'^#.*', re.MULTILINE)
+UNSAFE_FILENAME_RE = re.compile(r'[^\w.\-]+')
+
+# Line-oriented variants, which never reach across line breaks
+LINE_TABLE_ESCAPED_CHAR_RE = re.compile(r'\\([-#\[\]()*_~])')  # Keeps \| so cells don't split
+LINE_FENCE_LANGUAGE_RE = re.compile(r'^(\s*(?:`{3,}|~{3,}))[ \t]*(\w+)[ \t]*$')
+LINE_LIST_MARKER_RE = re.compile(r'^([ \t]*[-\*\+])[ \t]+')
+LINE_LIST_ITEM_RE = re.compile(r'^[ \t]*[-\*\+] ')
+LINE_TABLE_PIPE_BEFORE_RE = re.compile(r'[ \t]+\|')
+LINE_TABLE_PIPE_AFTER_RE = re.compile(r'\|[ \t]+')
+LINE_HEADING_TRAILING_RE = re.compile(r'^(#+[ \t].*?)[ \t]*#+[ \t]*$')
+
+def _split_outside_fences(text, starts_block):
+    """Split text into blocks before each line where `starts_block(line, prev_line)` holds,
+    never inside a fenced code block."""
+    blocks, current, fence, prev = [], [], None, ''
+    for line in text.splitlines(keepends=True):
+        match = FENCE_RE.match(line)
+        if fence:
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence):
+                fence = None
+        else:
+            if current and starts_block(line, prev):
+                blocks.append(''.join(current))
+                current = []
+            if match:
+                fence = match.group(1)
+        current.append(line)
+        prev = line
+    if current:
+        blocks.append(''.join(current))
+    return blocks
+
+def _pack_blocks(blocks, max_chars):
+    """Greedily merge consecutive blocks into chunks of at most max_chars."""
+    chunks, current = [], ''
+    for block in blocks:
+        if current and len(current) + len(block) > max_chars:
+            chunks.append(current)
+            current = ''
+        current += block
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _markdown_headings(text):
+    """Return `(level, title)` for each ATX or setext heading outside fenced code blocks."""
+    headings, fence, prev = [], None, ''
+    for line in text.splitlines():
+        match = FENCE_RE.match(line)
+        if fence:
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence):
+                fence = None
+        elif match:
+            fence = match.group(1)
+        elif line.startswith('#'):
+            heading = MARKDOWN_HEADING_RE.match(line)
+            if heading:
+                headings.append((len(heading.group(1)), heading.group(2).strip()))
+                line = ''  # Not a setext heading's text
+        else:
+            underline = SETEXT_UNDERLINE_RE.match(line)
+            if underline and prev.strip() and prev[0] not in '-*+|>' and not prev.startswith('    '):
+                headings.append((1 if underline.group(1)[0] == '=' else 2, prev.strip()))
+                line = ''
+        prev = line
+    return headings
+
+def heading_anchor(title):
+    """Return the `#anchor` a markdown renderer generates for a heading."""
+    return ANCHOR_CHARS_RE.sub('', title.lower()).replace(' ', '-')
+
+# bs4, markdownify, jinja2 and the Gemini SDK are imported on first use, so importing
+# this module (the CLI, server.py, render workers) doesn't pay for what a run never touches.
+
+def _markdownify(html):
+    from markdownify import markdownify
+    return markdownify(html)
+
+@lru_cache(maxsize=None)
+def _implied_end_tag_soup():
+    """Return a BeautifulSoup subclass that closes elements with omitted end tags.
+
+    html.parser leaves an unclosed `<li>`, `<p>` or `<td>` open, so the next item ends up
+    inside it. This applies the HTML5 rules for those tags, which lxml and selectolax
+    already follow, so valid pages render the same with every backend.
+    """
+    from bs4 import BeautifulSoup
+    
+    class ImpliedEndTagSoup(BeautifulSoup):
+        def handle_starttag(self, name, namespace, nsprefix, attrs, *args, **kwargs):
+            if name in _PARAGRAPH_CLOSING_TAGS:
+                self._close_implied(('p',), _PARAGRAPH_SCOPE)
+                if name in _HEADING_TAGS and self.currentTag.name in _HEADING_TAGS:
+                    self.endData()
+                    self.popTag()
+            if name in _IMPLIED_END_TAGS:
+                self._close_implied(*_IMPLIED_END_TAGS[name])
+            return super().handle_starttag(name, namespace, nsprefix, attrs, *args, **kwargs)
+        
+        def _close_implied(self, names, boundaries):
+            # open_tag_counter skips the stack walk when nothing closable is open
+            if not any(self.open_tag_counter.get(name) for name in names):
+                return
+            for tag in reversed(self.tagStack):
+                if tag.name in names:
+                    self.endData()
+                    self._popToTag(tag.name)
+                    return
+                if tag.name in boundaries:
+                    return
+    
+    return ImpliedEndTagSoup
+
+@lru_cache(maxsize=None)
+def _load_prompt_template(name):
+    """Compile a prompt template once per process and return it with its source, used in cache keys."""
+    from jinja2 import Environment, FileSystemLoader
+    env = Environment(loader=FileSystemLoader(PROMPTS_DIR))
+    return env.get_template(name), env.loader.get_source(env, name)[0]
+
+def _gemini_model(api_key, model_name=GEMINI_MODEL_NAME):
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
+
+def create_session(pool_maxsize=10, pool_connections=16):
+    """Create a requests session that keeps up to `pool_maxsize` connections per host.
+
+    Retries are handled by `DocsConverter.request_with_retries`, so urllib3's are off.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def _load_selectolax():
+    """Return selectolax's HTML parser class, preferring the lexbor engine, or None."""
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+        return LexborHTMLParser
+    except ImportError:
+        pass
+    try:
+        from selectolax.parser import HTMLParser
+        return HTMLParser
+    except ImportError:
+        return None
+
+def _decompose_nodes(nodes):
+    """Decompose selectolax nodes, skipping those already removed with an ancestor."""
+    removed = set()
+    for node in nodes:
+        parent = node.parent
+        while parent is not None and parent.mem_id not in removed:
+            parent = parent.parent
+        if parent is None:
+            removed.add(node.mem_id)
+            node.decompose()
+
+_worker_converter = None
+
+def _init_render_worker(settings):
+    """Build the converter used by a render worker process."""
+    global _worker_converter
+    exclude_selectors = settings.pop('exclude_selectors')
+    _worker_converter = DocsConverter(**settings)
+    _worker_converter.exclude_selectors = exclude_selectors
+
+def _render_markdown_in_worker(html, url, depth, fingerprint=False):
+    # Links are returned unfiltered, the coordinator owns the visited set and duplicate index
+    fingerprints = []
+    
+    def duplicate_check(title, content):
+        fingerprints.append((title, _worker_converter.page_fingerprint(content)))
+    
+    with _worker_converter.metrics.page(url, depth) as record:
+        raw_markdown, links = _worker_converter.render_markdown(
+            html, url, depth, exclude_visited=False, duplicate_check=duplicate_check if fingerprint else None)
+    return raw_markdown, links, record['stages'], fingerprints[0] if fingerprints else None
+
+class HostScheduler:
+    """Per-host politeness: caps requests per second and concurrent requests to each host.
+
+    With `adaptive`, each host's rate starts at `max_rps` and is tuned from the responses
+    passed to `report`. It ramps up towards `adaptive_max_rps` while responses are fast
+    and healthy. It is cut on 429/503 responses or when latency climbs well above its
+    baseline. A host can also be paused, e.g. for `Retry-After`, whether adaptive or not.
+    """
+
+    def __init__(self, max_rps=5.0, max_concurrency=4, adaptive=False, adaptive_max_rps=None, min_rps=0.2):
+        self.max_rps = max_rps
+        self.max_concurrency = max_concurrency
+        self.adaptive = adaptive
+        self.adaptive_max_rps = adaptive_max_rps or max_rps * 4
+        self.min_rps = min_rps
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host_state(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = {
+                    'semaphore': threading.BoundedSemaphore(self.max_concurrency),
+                    'next_slot': 0.0,
+                    'rps': self.max_rps,
+                    'latency': None,
+                    'baseline': None,
+                    'last_decrease': 0.0,
+                }
+                self._hosts[host] = state
+            return state
+
+    @contextmanager
+    def slot(self, url):
+        """Block until a request to the URL's host is allowed, holding a concurrency slot meanwhile."""
+        state = self._host_state(urlparse(url).netloc)
+        state['semaphore'].acquire()
+        try:
+            # Reserve the next start time for this host so requests are spaced evenly
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, state['next_slot'])
+                if state['rps']:
+                    state['next_slot'] = start + 1.0 / state['rps']
+            if start > now:
+                time.sleep(start - now)
+            yield
+        finally:
+            state['semaphore'].release()
+
+    def pause(self, url, seconds):
+        """Hold back every request to the URL's host for `seconds`."""
+        state = self._host_state(urlparse(url).netloc)
+        with self._lock:
+            state['next_slot'] = max(state['next_slot'], time.monotonic() + seconds)
+
+    def report(self, url, latency, status):
+        """Feed a response's latency and status back into the host's adaptive rate."""
+        state = self._host_state(urlparse(url).netloc)
+        if not self.adaptive or not state['rps']:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if status in THROTTLE_STATUSES:
+                self._decrease(state, now, 0.5)
+                return
+            latency = latency if state['latency'] is None else 0.8 * state['latency'] + 0.2 * latency
+            state['latency'] = latency
+            # The baseline creeps up slowly so a lasting change in latency becomes the new normal
+            state['baseline'] = latency if state['baseline'] is None else min(latency, state['baseline'] * 1.01)
+            if latency > 2 * state['baseline'] + 0.05:
+                self._decrease(state, now, 0.8)
+            else:
+                # Additive increase, slower the higher the rate already is
+                state['rps'] = min(self.adaptive_max_rps, state['rps'] + 0.5 / state['rps'])
+
+    def _decrease(self, state, now, factor):
+        # At most one cut per second, so a burst of bad responses to in-flight requests counts once
+        if now - state['last_decrease'] >= 1.0:
+            state['rps'] = max(self.min_rps, state['rps'] * factor)
+            state['last_decrease'] = now
+
+class DiskCache:
+    """Directory of JSON entries keyed by a hash, with an optional TTL and LRU eviction past a size cap."""
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, ttl=None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        # Rebuild the LRU index from disk, least recently used first
+        entries = []
+        for path in self.cache_dir.glob('*.json'):
+            stat = path.stat()
+            entries.append((stat.st_mtime, path.name, stat.st_size))
+        self._index = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self.total_bytes = sum(self._index.values())
+
+    def _entry_name(self, key):
+        return hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json'
+
+    def _remove(self, name):
+        self.total_bytes -= self._index.pop(name, 0)
+        try:
+            (self.cache_dir / name).unlink()
+        except OSError:
+            pass
+
+    def get(self, key):
+        """Return the cached entry for a key, or None."""
+        name = self._entry_name(key)
+        with self._lock:
+            if name not in self._index:
+                self.misses += 1
+                return None
+            path = self.cache_dir / name
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                os.utime(path)  # Persist recency across runs
+            except (OSError, ValueError):
+                self._remove(name)
+                self.misses += 1
+                return None
+            if self.ttl is not None and time.time() - entry.get('stored_at', 0) > self.ttl:
+                self._remove(name)
+                self.misses += 1
+                return None
+            self._index.move_to_end(name)
+            self.hits += 1
+            return entry
+
+    def set(self, key, entry):
+        """Store an entry, evicting the least recently used ones past the size cap."""
+        name = self._entry_name(key)
+        data = json.dumps({**entry, 'stored_at': time.time()}).encode('utf-8')
+        with self._lock:
+            path = self.cache_dir / name
+            tmp_path = path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            
+            self.total_bytes -= self._index.pop(name, 0)
+            self._index[name] = len(data)
+            self.total_bytes += len(data)
+            
+            while self.total_bytes > self.max_bytes and len(self._index) > 1:
+                self._remove(next(iter(self._index)))
+
+class ResponseCache(DiskCache):
+    """On-disk HTTP response cache with validators for conditional revalidation."""
+
+    def put(self, url, body, etag=None, last_modified=None):
+        """Store a response body with its validators under its normalized URL."""
+        self.set(url, {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'body': body,
+        })
+
+class GeminiCache(DiskCache):
+    """On-disk cache of Gemini cleanup results keyed by the full prompt inputs."""
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024, ttl=30 * 24 * 3600):
+        super().__init__(cache_dir, max_bytes, ttl)
+
+    def make_key(self, template_name, template_source, model_name, content):
+        # Including the template source means editing the prompt invalidates its entries
+        return '\0'.join([template_name, template_source, model_name, content])
+
+class ConversionManifest:
+    """Content-hash manifest mapping each page URL to its HTML hash and rendered markdown section.
+
+    Warnings go to `log`, the converter's log when it owns the manifest.
+    """
+
+    def __init__(self, path, log=print):
+        self.path = Path(path)
+        self.previous = {}
+        self.pages = {}
+        self.reused = 0
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.previous = json.load(f).get('pages', {})
+            except (OSError, ValueError) as e:
+                log(f"Ignoring unreadable manifest {self.path}: {str(e)}")
+
+    def lookup(self, url, html_hash, depth, gemini):
+        """Return the previous entry for a page if it was rendered from identical HTML."""
+        entry = self.previous.get(url)
+        if (entry and entry['hash'] == html_hash and entry['depth'] == depth
+                and entry['gemini'] == gemini):
+            return entry
+        return None
+
+    def reuse(self, url, entry):
+        """Carry a previous entry over into this run."""
+        with self._lock:
+            self.pages[url] = entry
+            self.reused += 1
+
+    def record(self, url, html_hash, depth, gemini, section, links):
+        self.pages[url] = {
+            'hash': html_hash,
+            'depth': depth,
+            'gemini': gemini,
+            'section': section,
+            'links': list(links),
+        }
+
+    def save(self, complete=True):
+        """Write the manifest; after a complete crawl, pages not seen again are recorded as removed."""
+        if complete:
+            pages = self.pages
+            removed = sorted(set(self.previous) - set(self.pages))
+        else:
+            # Keep entries for pages the interrupted crawl did not reach
+            pages = {**self.previous, **self.pages}
+            removed = []
+        
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'pages': pages, 'removed': removed}, f)
+        os.replace(tmp_path, self.path)
+        return removed
+
+class UrlSet:
+    """Exact set of URLs that stores a 64-bit hash of each URL instead of the string."""
+
+    def __init__(self, urls=()):
+        self._keys = set()
+        for url in urls:
+            self.add(url)
+
+    @staticmethod
+    def _key(url):
+        return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def add(self, url):
+        self._keys.add(self._key(url))
+
+    def __contains__(self, url):
+        return self._key(url) in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+class BloomFilter:
+    """Fixed-size probabilistic URL set for very large crawls.
+
+    Membership tests have no false negatives. False positives are bounded by
+    `error_rate` while no more than `capacity` URLs have been added. In a crawl, a false
+    positive means a page is skipped.
+    """
+
+    def __init__(self, capacity=1_000_000, error_rate=0.001, urls=()):
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+        for url in urls:
+            self.add(url)
+
+    def _positions(self, url):
+        # Double hashing: derive every bit position from two 64-bit halves of one digest
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, url):
+        for position in self._positions(url):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self._count += 1
+
+    def __contains__(self, url):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(url))
+
+    def __len__(self):
+        """Number of URLs added (approximate if some were added more than once)."""
+        return self._count
+
+class Frontier:
+    """FIFO queue of `(url, depth)` pairs that stores the URLs and run-length encoded depths.
+
+    BFS depths only ever grow along the queue, so they collapse into a handful of runs
+    instead of a tuple per URL.
+    """
+
+    def __init__(self, items=()):
+        self._urls = deque()
+        self._depths = deque()  # [depth, count] runs
+        self.appended = 0  # Pairs ever queued, the position the next one gets
+        for item in items:
+            self.append(item)
+
+    def append(self, item):
+        url, depth = item
+        self._urls.append(url)
+        self.appended += 1
+        if self._depths and self._depths[-1][0] == depth:
+            self._depths[-1][1] += 1
+        else:
+            self._depths.append([depth, 1])
+
+    def popleft(self):
+        url = self._urls.popleft()
+        run = self._depths[0]
+        run[1] -= 1
+        if not run[1]:
+            self._depths.popleft()
+        return url, run[0]
+
+    def __iter__(self):
+        urls = iter(self._urls)
+        for depth, count in self._depths:
+            for _ in range(count):
+                yield next(urls), depth
+
+    def tail(self, count):
+        """Return the last `count` pairs in queue order, without walking the rest of the queue."""
+        urls = reversed(self._urls)
+        items = []
+        for depth, run in reversed(self._depths):
+            if len(items) == count:
+                break
+            items.extend((next(urls), depth) for _ in range(min(run, count - len(items))))
+        items.reverse()
+        return items
+
+    def __len__(self):
+        return len(self._urls)
+
+# Multiply-shift hash functions standing in for random permutations of shingle hashes.
+# The seed is fixed so render workers compute the same signatures as the crawl.
+_MINHASH_RANDOM = random.Random(0x5EED)
+_MINHASH_SEEDS = [(_MINHASH_RANDOM.getrandbits(64) | 1, _MINHASH_RANDOM.getrandbits(64)) for _ in range(128)]
+_MINHASH_MASK = (1 << 64) - 1
+
+class DuplicateIndex:
+    """Content fingerprints of crawled pages for exact and near-duplicate detection.
+
+    Exact duplicates share a hash of the page's normalized words. Near duplicates are
+    pages whose sets of word 3-shingles have a Jaccard similarity of at least `threshold`,
+    estimated from 128-value MinHash signatures. Signatures are split into bands of
+    `BAND_ROWS` values and pages sharing a band become candidates, so every page isn't
+    compared with every other; each candidate is then confirmed by the similarity its
+    full signature estimates. Pages are registered with their crawl order, and a page
+    only matches earlier pages, so the outcome does not depend on which thread finished first.
+    """
+
+    BAND_ROWS = 8
+
+    def __init__(self, threshold=0.85, min_tokens=20):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Duplicate threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.min_tokens = min_tokens
+        self._exact = {}
+        self._band_index = [{} for _ in range(len(_MINHASH_SEEDS) // self.BAND_ROWS)]
+        self._lock = threading.Lock()
+
+    def fingerprint(self, text):
+        """Return `(exact_digest, signature)` for a page's text, or None if it has no words.
+
+        The MinHash signature is None for pages too short to compare reliably.
+        """
+        tokens = WORD_RE.findall(text.lower())
+        if not tokens:
+            return None
+        digest = hashlib.blake2b(' '.join(tokens).encode('utf-8'), digest_size=16).digest()
+        if len(tokens) < self.min_tokens:
+            return digest, None
+        
+        hashes = [int.from_bytes(hashlib.blake2b(' '.join(tokens[i:i + 3]).encode('utf-8'), digest_size=8).digest(),
+                                 'little')
+                  for i in range(len(tokens) - 2)]
+        hashes = list(set(hashes))
+        # The minimum of the masked products keeps the top 32 bits, the best mixed ones
+        signature = array('I', [min([(a * h + b) & _MINHASH_MASK for h in hashes]) >> 32
+                                for a, b in _MINHASH_SEEDS])
+        return digest, signature
+
+    def _band_keys(self, signature):
+        rows = self.BAND_ROWS
+        return [signature[start:start + rows].tobytes() for start in range(0, len(signature), rows)]
+
+    @staticmethod
+    def similarity(signature, other):
+        """Estimate the Jaccard similarity of two pages' shingles from their signatures."""
+        return sum(map(operator.eq, signature, other)) / len(signature)
+
+    def add(self, order, url, title, fingerprint):
+        digest, signature = fingerprint
+        entry = (order, url, title, signature)
+        with self._lock:
+            self._exact.setdefault(digest, []).append(entry)
+            if signature is not None:
+                for index, key in zip(self._band_index, self._band_keys(signature)):
+                    index.setdefault(key, []).append(entry)
+
+    def find_original(self, fingerprint, order):
+        """Return `(url, title)` of the earliest page before `order` with the same or nearly the same content."""
+        digest, signature = fingerprint
+        with self._lock:
+            candidates = [entry for entry in self._exact.get(digest, ()) if entry[0] < order]
+            if signature is not None:
+                # A band hit is only a candidate, confirm it with the whole signature
+                checked = set()
+                for index, key in zip(self._band_index, self._band_keys(signature)):
+                    for entry in index.get(key, ()):
+                        if entry[0] < order and entry[0] not in checked:
+                            checked.add(entry[0])
+                            if self.similarity(entry[3], signature) >= self.threshold:
+                                candidates.append(entry)
+        if not candidates:
+            return None
+        _, url, title, _ = min(candidates, key=lambda entry: entry[0])
+        return url, title
+
+class CrawlCheckpoint:
+    """SQLite checkpoint of a crawl: the frontier, the pages already converted and the output offset.
+
+    Converted URLs are appended as pages finish. Frontier rows are numbered by their
+    position in the crawl queue: each save appends the URLs queued since the last one,
+    drops the finished rows and moves the start of the frontier in `meta`, so a save
+    costs the pages since the previous save, not the size of the frontier. All of it
+    happens in one transaction with the output offset, so a resumed crawl never sees a
+    frontier that disagrees with the output file.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._converted = []
+        self._db = sqlite3.connect(str(self.path))
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS converted (url TEXT PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS frontier (position INTEGER PRIMARY KEY, url TEXT, depth INTEGER);
+        ''')
+
+    def load(self, base_url, max_depth):
+        """Return `(frontier, converted_urls, output_offset, pages)`, or None if there's nothing to resume."""
+        meta = dict(self._db.execute('SELECT key, value FROM meta'))
+        if meta.get('base_url') != base_url or meta.get('max_depth') != str(max_depth):
+            return None
+        frontier = self._db.execute('SELECT url, depth FROM frontier WHERE position >= ? ORDER BY position',
+                                    (int(meta.get('frontier_start', 0)),)).fetchall()
+        converted = {url for (url,) in self._db.execute('SELECT url FROM converted')}
+        return frontier, converted, int(meta['offset']), int(meta['pages'])
+
+    def reset(self):
+        with self._db:
+            for table in ('meta', 'converted', 'frontier'):
+                self._db.execute(f'DELETE FROM {table}')
+        self._converted = []
+
+    def page_done(self, url):
+        self._converted.append(url)
+
+    def save(self, base_url, max_depth, frontier_start, appended_at, appended, offset, pages):
+        """Record the crawl's progress.
+
+        Every queue position before `frontier_start` is finished. `appended` holds the
+        `(url, depth)` pairs queued from position `appended_at` on, which the checkpoint
+        doesn't have yet; rows from an earlier run at those positions are replaced.
+        """
+        with self._db:
+            self._db.executemany('INSERT OR IGNORE INTO converted VALUES (?)', ((url,) for url in self._converted))
+            self._db.execute('DELETE FROM frontier WHERE position < ? OR position >= ?', (frontier_start, appended_at))
+            self._db.executemany('INSERT INTO frontier VALUES (?, ?, ?)',
+                                 ((position, url, depth) for position, (url, depth) in enumerate(appended, appended_at)))
+            self._db.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', [
+                ('base_url', base_url),
+                ('max_depth', str(max_depth)),
+                ('frontier_start', str(frontier_start)),
+                ('offset', str(offset)),
+                ('pages', str(pages)),
+            ])
+        self._converted = []
+
+    def discard(self):
+        """Remove the checkpoint once the crawl has finished."""
+        self._db.close()
+        self.path.unlink(missing_ok=True)
+
+    def close(self):
+        self._db.close()
+
+class OutputSink:
+    """Single buffered writer for the combined output that keeps sections in order.
+
+    Sections submitted out of order are held back until every earlier index has been
+    written. Output can optionally be gzip or zstd compressed. Passing `resume_offset`
+    truncates an existing uncompressed file to that size and appends to it.
+    """
+
+    SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+    def __init__(self, path, compression=None, buffer_size=1024 * 1024, resume_offset=None, first_index=0):
+        if compression not in self.SUFFIXES:
+            raise ValueError(f"Unsupported compression: {compression}")
+        if resume_offset is not None and compression:
+            raise ValueError("Compressed output can't be resumed")
+        self.path = str(path) + self.SUFFIXES[compression]
+        self.next_index = first_index
+        self._pending = {}
+        self._lock = threading.Lock()
+        
+        if compression == 'gzip':
+            self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+        elif compression == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise RuntimeError("zstd output requires the 'zstandard' package")
+            raw = zstandard.ZstdCompressor().stream_writer(open(self.path, 'wb'))
+            self._file = io.TextIOWrapper(raw, encoding='utf-8')
+        elif resume_offset is not None:
+            # Drop anything written after the checkpoint, it is regenerated on resume
+            with open(self.path, 'r+b') as f:
+                f.truncate(resume_offset)
+            self._file = open(self.path, 'a', encoding='utf-8', buffering=buffer_size)
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8', buffering=buffer_size)
+
+    def write(self, text):
+        """Write text immediately, outside the ordered section stream."""
+        with self._lock:
+            self._file.write(text)
+
+    def submit(self, index, text):
+        """Queue the section with the given index; `None` marks an index with no output."""
+        with self._lock:
+            self._pending[index] = text
+            while self.next_index in self._pending:
+                text = self._pending.pop(self.next_index)
+                if text:
+                    self._file.write(text)
+                self.next_index += 1
+
+    def flush(self):
+        """Flush buffered output and return the size of the output file."""
+        with self._lock:
+            self._file.flush()
+            return os.path.getsize(self.path)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class PageTreeSink:
+    """Writes each page to its own markdown file in a directory tree mirroring the URL paths.
+
+    Every written page also gets a line in `index.jsonl` with its URL, file, title, depth
+    and heading anchors, so the index is complete up to the last finished page.
+    Passing `resume_offset` truncates the index to that size and appends to it, like
+    `OutputSink`. `write_toc` and `combine` build the table of contents and the single
+    combined file from the index afterwards, reading the page files back from disk.
+    """
+
+    INDEX_NAME = 'index.jsonl'
+    TOC_NAME = 'toc.md'
+
+    def __init__(self, directory, base_url, resume_offset=None):
+        self.directory = Path(directory)
+        self.path = str(self.directory)
+        self.index_path = self.directory / self.INDEX_NAME
+        self.base_path = urlparse(base_url).path.rstrip('/')
+        self._taken = {self.TOC_NAME}
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        
+        if resume_offset is not None:
+            # Drop pages indexed after the checkpoint, they are written again on resume
+            with open(self.index_path, 'r+b') as f:
+                f.truncate(resume_offset)
+            self._taken.update(entry['path'] for entry in self.entries())
+            self._index = open(self.index_path, 'a', encoding='utf-8')
+        else:
+            self._index = open(self.index_path, 'w', encoding='utf-8')
+
+    def page_path(self, url):
+        """Return the file for a page relative to the output directory, e.g. `guide/install.md`."""
+        parsed = urlparse(url)
+        path = parsed.path
+        if path.startswith(self.base_path):
+            path = path[len(self.base_path):]
+        parts = [UNSAFE_FILENAME_RE.sub('-', unquote(part))[:120]
+                 for part in path.split('/') if part not in ('', '.', '..')]
+        if not parts or path.endswith('/'):
+            parts.append('index')
+        stem, ext = os.path.splitext(parts[-1])
+        if ext.lower() in ('.html', '.htm', '.php', '.asp', '.aspx', '.md'):
+            parts[-1] = stem
+        if parsed.query:
+            parts[-1] += '__' + UNSAFE_FILENAME_RE.sub('-', unquote(parsed.query))[:80]
+        
+        relative = '/'.join(parts) + '.md'
+        suffix = 1
+        while relative in self._taken:
+            suffix += 1
+            relative = f"{'/'.join(parts)}-{suffix}.md"
+        self._taken.add(relative)
+        return relative
+
+    def write_page(self, url, depth, text):
+        """Write one page's section to its file and append its index entry."""
+        if not text:
+            return
+        with self._lock:
+            relative = self.page_path(url)
+            target = self.directory / relative
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(target, 'w', encoding='utf-8') as f:
+                f.write(text)
+            headings = [{'level': level, 'title': title, 'anchor': heading_anchor(title)}
+                        for level, title in _markdown_headings(text)]
+            entry = {
+                'url': url,
+                'path': relative,
+                'title': headings[0]['title'] if headings else url,
+                'depth': depth,
+                'headings': headings,
+            }
+            self._index.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def entries(self):
+        """Yield the index entries in crawl order."""
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def write_toc(self, title, max_level=3):
+        """Write `toc.md`, linking every page and its headings up to `max_level`."""
+        self.flush()
+        with open(self.directory / self.TOC_NAME, 'w', encoding='utf-8') as f:
+            f.write(f"# {title}\n\n")
+            for entry in self.entries():
+                f.write(f"{'  ' * entry['depth']}- [{entry['title']}]({entry['path']})\n")
+                for heading in entry['headings'][1:]:
+                    if heading['level'] <= max_level:
+                        indent = '  ' * (entry['depth'] + heading['level'])
+                        f.write(f"{indent}- [{heading['title']}]({entry['path']}#{heading['anchor']})\n")
+        return str(self.directory / self.TOC_NAME)
+
+    def combine(self, path, header='', compression=None):
+        """Concatenate the page files in crawl order into one file, streaming them from disk."""
+        self.flush()
+        with OutputSink(path, compression=compression) as sink:
+            sink.write(header)
+            for entry in self.entries():
+                with open(self.directory / entry['path'], 'r', encoding='utf-8') as f:
+                    shutil.copyfileobj(f, sink)
+        return sink.path
+
+    def flush(self):
+        """Flush the index and return its size, the resume offset for checkpoints."""
+        with self._lock:
+            self._index.flush()
+            return os.path.getsize(self.index_path)
+
+    def close(self):
+        with self._lock:
+            self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class CrawlMetrics:
+    """Thread-safe per-stage timers and counters for conversions.
+
+    Stage timings are also attributed to the page being rendered on the current thread.
+    With a trace path, each finished page is appended to it as one JSON line. Everything
+    recorded is also added to `parent`, if given, so a registry shared by several
+    conversions keeps the totals while each conversion reports only its own.
+    """
+
+    def __init__(self, trace_path=None, parent=None):
+        self.started_at = time.perf_counter()
+        self.stages = {}  # name -> [calls, total seconds, max seconds]
+        self.counters = {}
+        self.parent = parent
+        self.trace_path = trace_path
+        self._trace_file = open(trace_path, 'a', encoding='utf-8') if trace_path else None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def record_stage(self, name, seconds):
+        with self._lock:
+            stats = self.stages.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+        if self.parent is not None:
+            self.parent.record_stage(name, seconds)
+        page = getattr(self._local, 'page', None)
+        if page is not None:
+            page['stages'][name] = page['stages'].get(name, 0.0) + seconds
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+        if self.parent is not None:
+            self.parent.increment(name, amount)
+        page = getattr(self._local, 'page', None)
+        if page is not None:
+            page['counters'][name] = page['counters'].get(name, 0) + amount
+
+    @contextmanager
+    def page(self, url, depth):
+        """Collect the stages and counters recorded on this thread into a per-page record."""
+        record = {'url': url, 'depth': depth, 'stages': {}, 'counters': {}}
+        previous = getattr(self._local, 'page', None)
+        self._local.page = record
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self._local.page = previous
+            record['seconds'] = time.perf_counter() - start
+            self.record_stage('page', record['seconds'])
+            if self._trace_file:
+                record['stages'] = {name: round(seconds, 6) for name, seconds in record['stages'].items()}
+                record['seconds'] = round(record['seconds'], 6)
+                line = json.dumps(record)
+                with self._lock:
+                    self._trace_file.write(line + '\n')
+                    self._trace_file.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'elapsed': time.perf_counter() - self.started_at,
+                'stages': {name: {'calls': calls, 'seconds': total, 'max': longest}
+                           for name, (calls, total, longest) in self.stages.items()},
+                'counters': dict(self.counters),
+            }
+
+    def summary(self):
+        """Format the stage timings and counters as a plain-text table."""
+        data = self.snapshot()
+        lines = [f"{'Stage':<16}{'Calls':>8}{'Total s':>10}{'Avg ms':>10}{'Max ms':>10}"]
+        for name, stats in sorted(data['stages'].items(), key=lambda item: -item[1]['seconds']):
+            lines.append(f"{name:<16}{stats['calls']:>8}{stats['seconds']:>10.2f}"
+                         f"{stats['seconds'] / stats['calls'] * 1000:>10.1f}{stats['max'] * 1000:>10.1f}")
+        counters = data['counters']
+        pages = counters.get('pages_converted', 0)
+        lines.append("")
+        lines.append(f"Elapsed: {data['elapsed']:.1f}s, {pages / max(data['elapsed'], 1e-9):.2f} pages/sec")
+        lines.append(f"Fetched: {counters.get('pages_fetched', 0)} pages, {counters.get('bytes_fetched', 0) / 1024 / 1024:.1f} MB")
+        for name in sorted(counters):
+            if name not in ('pages_fetched', 'bytes_fetched'):
+                lines.append(f"{name.replace('_', ' ').capitalize()}: {counters[name]}")
+        return '\n'.join(lines)
+
+    def prometheus(self, prefix='docs_converter'):
+        """Render the metrics in the Prometheus text exposition format."""
+        data = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total Time spent in each conversion stage.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{name}"}} {stats["seconds"]:.6f}'
+                  for name, stats in sorted(data['stages'].items())]
+        lines += [f"# HELP {prefix}_stage_calls_total Number of times each stage ran.",
+                  f"# TYPE {prefix}_stage_calls_total counter"]
+        lines += [f'{prefix}_stage_calls_total{{stage="{name}"}} {stats["calls"]}'
+                  for name, stats in sorted(data['stages'].items())]
+        lines += [f"# HELP {prefix}_stage_max_seconds Longest single run of each stage.",
+                  f"# TYPE {prefix}_stage_max_seconds gauge"]
+        lines += [f'{prefix}_stage_max_seconds{{stage="{name}"}} {stats["max"]:.6f}'
+                  for name, stats in sorted(data['stages'].items())]
+        for name, value in sorted(data['counters'].items()):
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+        lines += [f"# TYPE {prefix}_uptime_seconds gauge", f"{prefix}_uptime_seconds {data['elapsed']:.3f}"]
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        if self._trace_file:
+            with self._lock:
+                self._trace_file.close()
+                self._trace_file = None
+
 class DocsConverter:
-    def __init__(self, base_url, domain=None, max_depth=None, gemini_api_key=None, session=None):
+    def __init__(self, base_url, domain=None, max_depth=None, gemini_api_key=None, session=None,
+                 concurrency=4, max_rps=5.0, host_concurrency=4, cache_dir=None,
+                 cache_max_bytes=512 * 1024 * 1024, incremental=False, gemini_cache_dir=None,
+                 gemini_cache_ttl=30 * 24 * 3600, gemini_chunk_size=30000, gemini_concurrency=4,
+                 gemini_rpm=60, compression=None, progress_callback=None, parser_backend='html.parser',
+                 workers=None, line_post_processing=False, checkpoint_interval=50, sitemap=False,
+                 follow_links=True, bloom_error_rate=None, bloom_capacity=1_000_000,
+                 link_cache_size=100_000, metrics=None, trace_path=None, profile_url=None,
+                 max_retries=3, retry_backoff=1.0, adaptive_rate=False, adaptive_max_rps=None,
+                 dedupe=False, split_dir=None, combine_split=False, output_prefix=None,
+                 quiet=False, dedupe_threshold=0.85):
         self.base_url = base_url.rstrip('/')
         self.domain = domain or urlparse(base_url).netloc
+        self.output_prefix = output_prefix or f"{self.domain}_docs"
         self.max_depth = max_depth
-        self.visited_urls = set()
-        self.session = session or requests.Session()
+        self.bloom_error_rate = bloom_error_rate
+        self.bloom_capacity = bloom_capacity
+        self.visited_urls = self.new_visited_set()
+        self.link_cache_size = link_cache_size
+        self._link_cache = {}
+        self.concurrency = max(1, concurrency)
+        if session is None:
+            # One pooled connection per thread that can hit a host
+            session = create_session(pool_maxsize=max(self.concurrency + (workers or 0), host_concurrency))
+        self.session = session
+        self.scheduler = HostScheduler(max_rps=max_rps, max_concurrency=host_concurrency,
+                                       adaptive=adaptive_rate, adaptive_max_rps=adaptive_max_rps)
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+        self.response_cache = ResponseCache(cache_dir, cache_max_bytes) if cache_dir else None
+        self.incremental = incremental
+        self.manifest = None
+        self.compression = compression
+        self.progress_callback = progress_callback
+        self.quiet = quiet
+        self.parser_backend = self._resolve_parser_backend(parser_backend)
+        self.workers = workers
+        self.process_pool = None
+        self.line_post_processing = line_post_processing
+        self.checkpoint_interval = checkpoint_interval
+        self.sitemap = sitemap
+        self.follow_links = follow_links
+        self._crawl_queue = Frontier()
+        self._crawl_pending = deque()
+        self._crawl_current = None
+        self.split_dir = split_dir
+        self.combine_split = combine_split
+        self.duplicates = DuplicateIndex(dedupe_threshold) if dedupe else None
+        self._page_order = {}
+        self._page_duplicates = {}
+        self._duplicate_targets = {}
+        self.metrics = metrics or CrawlMetrics(trace_path)
+        self.profile_url = self.normalize_url(profile_url) if profile_url else None
+        self.pages_fetched = 0
+        self._progress_lock = threading.Lock()
         self.exclude_selectors = [
             'nav', 'header', 'footer', 
             '.sidebar', '.navigation', '.menu',
@@ -27,17 +1154,28 @@ class DocsConverter:
             '.toolbar', '#toolbar'
         ]
         
-        # Initialize Jinja environment
-        templates_dir = Path(__file__).parent / 'templates' / 'prompts'
-        self.jinja_env = Environment(loader=FileSystemLoader(templates_dir))
-        
         # Initialize Gemini if API key is provided
+        self.model_name = GEMINI_MODEL_NAME
         if gemini_api_key:
-            genai.configure(api_key=gemini_api_key)
-            self.model = genai.GenerativeModel('gemini-1.5-flash-002')
+            self.model = _gemini_model(gemini_api_key, self.model_name)
         else:
             self.model = None
+        self.gemini_cache = GeminiCache(gemini_cache_dir, ttl=gemini_cache_ttl) if gemini_cache_dir else None
+        self.gemini_chunk_size = gemini_chunk_size
+        self.gemini_concurrency = max(1, gemini_concurrency)
+        self.gemini_scheduler = HostScheduler(max_rps=gemini_rpm / 60.0, max_concurrency=self.gemini_concurrency)
         
+    def log(self, message):
+        """Print a progress or diagnostic message, unless the converter is quiet."""
+        if not self.quiet:
+            print(message)
+
+    def new_visited_set(self, urls=()):
+        """Create the visited-URL set: hashed keys, or a Bloom filter when `bloom_error_rate` is set."""
+        if self.bloom_error_rate:
+            return BloomFilter(self.bloom_capacity, self.bloom_error_rate, urls)
+        return UrlSet(urls)
+
     def get_url_depth(self, url):
         """Calculate the depth of a URL relative to base_url."""
         base_path = urlparse(self.base_url).path.rstrip('/').split('/')
@@ -81,20 +1219,320 @@ class DocsConverter:
             
         return True
     
-    def get_page_content(self, url):
-        """Fetch and parse page content."""
+    def fetch_page(self, url):
+        """Fetch the raw HTML of a page, revalidating against the response cache when enabled."""
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            response = self.session.get(url, headers=headers, timeout=10)
+            headers = {'User-Agent': USER_AGENT}
+            
+            cache_key = self.normalize_url(url)
+            cached = self.response_cache.get(cache_key) if self.response_cache else None
+            if cached:
+                if cached.get('etag'):
+                    headers['If-None-Match'] = cached['etag']
+                if cached.get('last_modified'):
+                    headers['If-Modified-Since'] = cached['last_modified']
+            
+            response = self.request_with_retries(url, headers=headers)
+            
+            if cached and response.status_code == 304:
+                self._count_fetched()
+                self.metrics.increment('not_modified')
+                return cached['body']
+            
+            response.raise_for_status()
+            self._count_fetched()
+            self.metrics.increment('bytes_fetched', len(response.content))
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if self.response_cache and (etag or last_modified):
+                self.response_cache.put(cache_key, response.text, etag, last_modified)
+            return response.text
+        except Exception as e:
+            self.log(f"Error fetching {url}: {str(e)}")
+            return None
+
+    def request_with_retries(self, url, **kwargs):
+        """GET a URL through the host scheduler, retrying transient failures.
+
+        Connection errors, timeouts and 429/5xx responses are retried up to `max_retries`
+        times with jittered exponential backoff. 429 and 503 pause the whole host, for the
+        `Retry-After` delay when the server sends one. Returns the last response, or
+        raises the last connection error.
+        """
+        kwargs.setdefault('timeout', 10)
+        for attempt in range(self.max_retries + 1):
+            wait_start = time.perf_counter()
+            try:
+                with self.scheduler.slot(url):
+                    start = time.perf_counter()
+                    self.metrics.record_stage('rate_limit', start - wait_start)
+                    with self.metrics.stage('fetch'):
+                        response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                self.log(f"Retrying {url} in {delay:.1f}s after error: {str(e)}")
+            else:
+                self.scheduler.report(url, time.perf_counter() - start, response.status_code)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+                response.close()
+                delay = self.backoff_delay(attempt)
+                if response.status_code in THROTTLE_STATUSES:
+                    self.metrics.increment('throttled')
+                    retry_after = self.parse_retry_after(response.headers.get('Retry-After'))
+                    # Throttling applies to the whole host, so every request to it waits
+                    self.scheduler.pause(url, retry_after if retry_after is not None else delay)
+                    delay = 0
+                self.log(f"Retrying {url} after HTTP {response.status_code}")
+            self.metrics.increment('retries')
+            if delay:
+                time.sleep(delay)
+
+    def backoff_delay(self, attempt):
+        """Exponential backoff with jitter: between half and all of `retry_backoff * 2**attempt`."""
+        delay = min(60.0, self.retry_backoff * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    @staticmethod
+    def parse_retry_after(value):
+        """Parse a `Retry-After` header given in seconds or as an HTTP date."""
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+        return min(max(0.0, seconds), MAX_RETRY_AFTER)
+
+    def read_sitemap(self, url):
+        """Stream a sitemap and return the `(child_sitemaps, page_urls)` it lists, in order.
+
+        Handles gzipped sitemaps (`.xml.gz`) as well as gzip transfer encoding, and both
+        `<urlset>` sitemaps and `<sitemapindex>` files pointing at further sitemaps.
+        """
+        response = self.request_with_retries(url, headers={'User-Agent': USER_AGENT}, stream=True)
+        
+        sitemaps, pages = [], []
+        with response:
             response.raise_for_status()
-            return BeautifulSoup(response.text, 'html.parser')
+            parser = ET.XMLPullParser(events=('end',))
+            decompressor = None
+            first = True
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                if first:
+                    first = False
+                    if chunk[:2] == b'\x1f\x8b':  # Gzip magic number
+                        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                parser.feed(decompressor.decompress(chunk) if decompressor else chunk)
+                
+                for event, element in parser.read_events():
+                    tag = element.tag.rsplit('}', 1)[-1]
+                    if tag in ('url', 'sitemap'):
+                        loc = next((child.text for child in element if child.tag.rsplit('}', 1)[-1] == 'loc'), None)
+                        if loc and loc.strip():
+                            (pages if tag == 'url' else sitemaps).append(loc.strip())
+                        element.clear()  # Keep memory flat on sitemaps with tens of thousands of URLs
+            parser.close()
+        self._count_fetched()
+        return sitemaps, pages
+
+    def sitemaps_from_robots(self, root):
+        """Return the sitemap URLs declared in the site's robots.txt."""
+        try:
+            response = self.request_with_retries(f"{root}/robots.txt", headers={'User-Agent': USER_AGENT})
+            if response.status_code != 200:
+                return []
+            return [line.split(':', 1)[1].strip() for line in response.text.splitlines()
+                    if line.lower().startswith('sitemap:')]
         except Exception as e:
-            print(f"Error fetching {url}: {str(e)}")
+            self.log(f"Error fetching robots.txt: {str(e)}")
+            return []
+
+    def discover_sitemap_urls(self):
+        """Collect every valid page URL listed in the site's sitemaps, following nested indexes.
+
+        Sitemaps are taken from robots.txt, falling back to `sitemap.xml` under the base URL
+        and the site root. Each level of a sitemap index is fetched concurrently.
+        """
+        parsed = urlparse(self.base_url)
+        root = f"{parsed.scheme}://{parsed.netloc}"
+        level = self.sitemaps_from_robots(root) or [f"{self.base_url}/sitemap.xml", f"{root}/sitemap.xml"]
+        seen_sitemaps = set()
+        seen_urls = set()
+        urls = []
+        
+        def read(sitemap_url):
+            try:
+                return self.read_sitemap(sitemap_url)
+            except Exception as e:
+                self.log(f"Error reading sitemap {sitemap_url}: {str(e)}")
+                return [], []
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while level:
+                level = [url for url in dict.fromkeys(level) if url not in seen_sitemaps]
+                seen_sitemaps.update(level)
+                next_level = []
+                for sitemaps, pages in executor.map(read, level):
+                    next_level.extend(sitemaps)
+                    for page in pages:
+                        url = self.normalize_url(page)
+                        if url not in seen_urls and self.is_valid_url(url):
+                            seen_urls.add(url)
+                            urls.append(url)
+                level = next_level
+        return urls
+
+    def initial_frontier(self):
+        """Return the `(url, depth)` pairs a new crawl starts from.
+
+        With `sitemap` enabled, every page listed in the sitemaps is queued up front,
+        shallowest paths first, so fetching does not wait on link extraction.
+        """
+        frontier = [(self.base_url, 0)]
+        if self.sitemap:
+            with self.metrics.stage('sitemap'):
+                urls = self.discover_sitemap_urls()
+            self.log(f"Found {len(urls)} pages in sitemaps")
+            frontier.extend(sorted(((url, self.get_url_depth(url)) for url in urls), key=lambda item: item[1]))
+        return frontier
+
+    def _count_fetched(self):
+        with self._progress_lock:
+            self.pages_fetched += 1
+        self.metrics.increment('pages_fetched')
+
+    def report_progress(self, **progress):
+        """Pass crawl progress (pages fetched/converted, queue depth) to the progress callback."""
+        if self.progress_callback:
+            self.progress_callback(progress)
+
+    def get_page_content(self, url):
+        """Fetch and parse page content."""
+        html = self.fetch_page(url)
+        if html is None:
             return None
+        return self.parse_html(html)
 
-    def normalize_url(self, url):
+    def _resolve_parser_backend(self, backend):
+        """Return the requested parser backend, or html.parser when it is not installed."""
+        if backend not in PARSER_BACKENDS:
+            raise ValueError(f"Unknown parser backend: {backend}")
+        if backend == 'lxml':
+            try:
+                import lxml  # noqa: F401
+            except ImportError:
+                self.log("lxml is not installed, falling back to html.parser")
+                return 'html.parser'
+        elif backend == 'selectolax':
+            self._selectolax_parser = _load_selectolax()
+            if self._selectolax_parser is None:
+                self.log("selectolax is not installed, falling back to html.parser")
+                return 'html.parser'
+            # selectolax re-serializes the main content as well-formed HTML, which lxml
+            # builds into the same tree as html.parser in a fraction of the time
+            try:
+                import lxml  # noqa: F401
+                self._subtree_builder = 'lxml'
+            except ImportError:
+                self._subtree_builder = 'html.parser'
+        return backend
+
+    def parse_html(self, html):
+        """Parse raw HTML into a BeautifulSoup tree."""
+        if self.parser_backend == 'lxml':
+            from bs4 import BeautifulSoup
+            return BeautifulSoup(html, 'lxml')
+        return _implied_end_tag_soup()(html, 'html.parser')
+
+    def parse_page(self, html, url, title_after_clean=False, exclude_visited=True):
+        """Parse a page into its title, cleaned main content element and outgoing links.
+
+        The title is taken from the raw page, or from the page with navigation removed
+        when `title_after_clean` is set. Links are not extracted when `follow_links` is off.
+        """
+        if self.parser_backend == 'selectolax':
+            return self._parse_page_selectolax(html, url, title_after_clean, exclude_visited)
+        
+        with self.metrics.stage('parse'):
+            soup = self.parse_html(html)
+        title = None if title_after_clean else self.get_page_title(soup, url)
+        with self.metrics.stage('clean'):
+            content = self.clean_content(soup)
+        if title_after_clean:
+            title = self.get_page_title(soup, url)
+        with self.metrics.stage('links'):
+            links = self.extract_links(soup, url, exclude_visited) if self.follow_links else []
+        return title, content, links
+
+    def _parse_page_selectolax(self, html, url, title_after_clean, exclude_visited):
+        """Fast path: isolate the main content and links with selectolax, then only hand the
+        main content to BeautifulSoup for cleaning and markdownify."""
+        with self.metrics.stage('parse'):
+            tree = self._selectolax_parser(html)
+        title = None if title_after_clean else self._selectolax_title(tree, url)
+        
+        clean_start = time.perf_counter()
+        _decompose_nodes(tree.css(', '.join(self.exclude_selectors + sorted(ALWAYS_EXCLUDED_TAGS))))
+        if title_after_clean:
+            title = self._selectolax_title(tree, url)
+        
+        main = None
+        for selector in ('main', 'article',
+                         ', '.join(f'div.{name}' for name in sorted(MAIN_CONTENT_CLASSES)),
+                         'div[role="main"]'):
+            main = tree.css_first(selector)
+            if main is not None:
+                break
+        
+        self.metrics.record_stage('clean', time.perf_counter() - clean_start)
+        
+        # clean_content drops text-less elements inside the main content, links included
+        with self.metrics.stage('links'):
+            hrefs = []
+            for a in tree.css('a[href]') if self.follow_links else ():
+                if not a.text(strip=True):
+                    node = a
+                    while main is not None and node is not None and node.mem_id != main.mem_id:
+                        node = node.parent
+                    if node is not None:
+                        continue
+                hrefs.append(a.attributes.get('href'))
+            links = self.filter_links(hrefs, url, exclude_visited)
+        
+        with self.metrics.stage('clean'):
+            from bs4 import BeautifulSoup
+            soup = BeautifulSoup(main.html if main is not None else tree.html, self._subtree_builder)
+            content = self.clean_content(soup)
+        return title, content, links
+
+    def _selectolax_title(self, tree, url):
+        """Mirror get_page_title on a selectolax tree."""
+        for selector, attribute in [
+            ('h1', None),
+            ('title', None),
+            ('h2', None),
+            ('meta[property="og:title"]', 'content'),
+            ('meta[name="title"]', 'content')
+        ]:
+            element = tree.css_first(selector)
+            if element is None:
+                continue
+            title = element.attributes.get(attribute) if attribute else element.text(strip=True)
+            if title:
+                return title
+        return self.title_from_url(url)
+
+    @staticmethod
+    def normalize_url(url):
         """Normalize URL by removing trailing slashes and fragments."""
         parsed = urlparse(url)
         normalized = f"{parsed.scheme}://{parsed.netloc}{parsed.path.rstrip('/')}"
@@ -102,57 +1540,150 @@ class DocsConverter:
             normalized += f"?{parsed.query}"
         return normalized
 
-    def extract_links(self, soup, current_url):
-        """Extract valid links from page."""
-        links = set()
+    def extract_links(self, soup, current_url, exclude_visited=True):
+        """Extract valid links from page, in document order."""
+        return self.filter_links((a.get('href') for a in soup.find_all(['a'])), current_url, exclude_visited)
+
+    def filter_links(self, hrefs, current_url, exclude_visited=True):
+        """Resolve hrefs against the page URL, keeping valid links in order."""
+        links = []
         seen_paths = set()
+        # Relative hrefs resolve the same way from every page in the same directory
+        slash = current_url.rfind('/')
+        directory = current_url[:slash + 1] if slash > current_url.find('://') + 2 else current_url
         
-        for a in soup.find_all(['a']):
-            if not a.get('href'):
+        for href in hrefs:
+            if not href:
                 continue
-                
-            href = a['href']
             
             if href.startswith('#'):
                 continue
-                
-            full_url = urljoin(current_url, href)
-            normalized_url = self.normalize_url(full_url)
             
-            parsed = urlparse(normalized_url)
-            if parsed.path in seen_paths:
+            normalized_url, path, valid = self.resolve_link(href, current_url, directory)
+            if path in seen_paths:
                 continue
                 
-            seen_paths.add(parsed.path)
+            seen_paths.add(path)
             
-            if self.is_valid_url(normalized_url) and normalized_url not in self.visited_urls:
-                links.add(normalized_url)
+            if valid and (not exclude_visited or normalized_url not in self.visited_urls):
+                links.append(normalized_url)
                 
         return links
 
+    def resolve_link(self, href, current_url, directory):
+        """Return `(normalized_url, path, valid)` for an href, parsing each distinct href only once."""
+        if href.startswith(('http://', 'https://')) or (href[0] == '/' and not href.startswith('//')):
+            key = href  # Crawled pages share the base URL's scheme and host
+        elif href[0] in '?;':
+            key = (current_url, href)  # Resolved against the full page URL
+        else:
+            key = (directory, href)
+        
+        resolved = self._link_cache.get(key)
+        if resolved is None:
+            normalized_url = self.normalize_url(urljoin(current_url, href))
+            resolved = (normalized_url, urlparse(normalized_url).path, self.is_valid_url(normalized_url))
+            if self.link_cache_size:
+                if len(self._link_cache) >= self.link_cache_size:
+                    self._link_cache.clear()
+                self._link_cache[key] = resolved
+        return resolved
+
     def clean_content(self, soup):
-        """Clean the HTML content before conversion."""
+        """Clean the HTML content before conversion and return the main content element.
+
+        Excluded elements are dropped and text emptiness is computed bottom-up in a single
+        post-order walk, instead of one selector scan per exclusion plus a `get_text` call
+        per element.
+        """
+        from bs4.element import Tag
+        text_string_types = Tag.DEFAULT_INTERESTING_STRING_TYPES
+        tags, classes, ids = set(ALWAYS_EXCLUDED_TAGS), set(), set()
         for selector in self.exclude_selectors:
-            for element in soup.select(selector):
-                element.decompose()
-            
-        for element in soup.find_all(['script', 'style', 'iframe', 'noscript']):
-            element.decompose()
+            match = SIMPLE_SELECTOR_RE.match(selector)
+            if not match:
+                # Selectors beyond tag/.class/#id still need a full select pass
+                for element in soup.select(selector):
+                    element.decompose()
+            elif match.group(1) == '.':
+                classes.add(match.group(2))
+            elif match.group(1) == '#':
+                ids.add(match.group(2))
+            else:
+                tags.add(match.group(2))
+        
+        candidates = {}     # First main content candidate of each kind, in document order
+        empty_roots = []    # (element, candidate kinds enclosing it) for topmost text-less elements
+        empty_candidates = set()
+        
+        # Frames are [tag, children, next child index, has text, empty children, enclosing kinds]
+        stack = [[soup, list(soup.contents), 0, False, [], frozenset()]]
+        while stack:
+            frame = stack[-1]
+            tag, children, index = frame[0], frame[1], frame[2]
+            if index < len(children):
+                frame[2] += 1
+                child = children[index]
+                if isinstance(child, Tag):
+                    if (child.name in tags or ids and child.get('id') in ids
+                            or classes and not classes.isdisjoint(child.get('class') or ())):
+                        child.decompose()  # Safe, the walk iterates over a copy of `contents`
+                        continue
+                    kind = self._main_content_kind(child)
+                    inside = frame[5]
+                    if kind and kind not in candidates:
+                        candidates[kind] = child
+                        inside = inside | {kind}
+                    stack.append([child, list(child.contents), 0, False, [], inside])
+                elif not frame[3] and type(child) in text_string_types and child.strip():
+                    frame[3] = True
+                continue
             
-        main_content = (
-            soup.find('main') or 
-            soup.find('article') or 
-            soup.find('div', {'class': ['content', 'main', 'document', 'documentation']}) or 
-            soup.find('div', {'role': 'main'}) or
-            soup
-        )
+            stack.pop()
+            has_text = frame[3]  # Text as seen by ancestors' get_text()
+            is_empty = not has_text
+            if tag.interesting_string_types is not text_string_types:
+                # Tags like <template> only count their own string types as text
+                is_empty = not tag.get_text(strip=True)
+            if not is_empty:
+                empty_roots.extend((element, frame[5]) for element in frame[4])
+            elif not stack or any(candidates[kind] is tag for kind in frame[5]):
+                empty_candidates.add(id(tag))
+            if stack:
+                parent = stack[-1]
+                parent[3] = parent[3] or has_text
+                if is_empty:
+                    parent[4].append(tag)
         
-        for element in main_content.find_all():
-            if len(element.get_text(strip=True)) == 0:
+        main_kind = next((kind for kind in ('main', 'article', 'content_div', 'role_div')
+                          if kind in candidates), None)
+        main_content = candidates[main_kind] if main_kind else soup
+        
+        if id(main_content) in empty_candidates:
+            # A main content element without text is tiny, so check its descendants directly
+            for element in main_content.find_all():
+                if len(element.get_text(strip=True)) == 0:
+                    element.decompose()
+            return main_content
+        
+        for element, inside in empty_roots:
+            if main_kind is None or main_kind in inside:
                 element.decompose()
                 
         return main_content
 
+    def _main_content_kind(self, tag):
+        if tag.name == 'main':
+            return 'main'
+        if tag.name == 'article':
+            return 'article'
+        if tag.name == 'div':
+            if not MAIN_CONTENT_CLASSES.isdisjoint(tag.get('class') or ()):
+                return 'content_div'
+            if tag.get('role') == 'main':
+                return 'role_div'
+        return None
+
     def get_page_title(self, soup, url):
         """Extract the page title using multiple fallback methods."""
         for selector in [
@@ -172,281 +1703,1149 @@ class DocsConverter:
             if title:
                 return title
                 
+        return self.title_from_url(url)
+
+    def title_from_url(self, url):
+        """Derive a title from the last URL path segment."""
         path = urlparse(url).path.rstrip('/')
         if path:
             return unquote(path.split('/')[-1].replace('-', ' ').replace('_', ' ').title())
         return 'Documentation'
 
+    def split_markdown(self, content: str, max_chars: int) -> list:
+        """Split markdown into chunks of at most max_chars at #/## headings, then at paragraphs.
+
+        Fenced code blocks are never split, so a chunk may exceed max_chars when a single
+        code block does.
+        """
+        sections = _split_outside_fences(content, lambda line, prev: CHUNK_HEADING_RE.match(line))
+        blocks = []
+        for section in sections:
+            if len(section) <= max_chars:
+                blocks.append(section)
+            else:
+                blocks.extend(_split_outside_fences(
+                    section, lambda line, prev: not prev.strip() and line.strip()))
+        return _pack_blocks(blocks, max_chars)
+
     def clean_markdown_with_gemini(self, content: str) -> str:
         """Use Gemini to clean and structure the markdown content."""
         if not self.model:
             return content
         
-        # Only process content if it's not too large
-        if len(content) > 30000:  # Gemini has a context limit
-            print("[yellow]Content too large for Gemini, returning original[/yellow]")
+        # Gemini has a context limit, so large content is cleaned chunk by chunk
+        chunks = self.split_markdown(content, self.gemini_chunk_size)
+        if len(chunks) == 1:
+            return self.clean_chunk_with_gemini(content)
+        
+        with ThreadPoolExecutor(max_workers=min(len(chunks), self.gemini_concurrency)) as executor:
+            cleaned = list(executor.map(self.clean_chunk_with_gemini, chunks))
+        # Normalize the joins between chunks only, the section's own leading and trailing
+        # newlines (e.g. after its closing `---`) separate it from its neighbours
+        body = '\n\n'.join(chunk.strip('\n') for chunk in cleaned)
+        leading = content[:len(content) - len(content.lstrip('\n'))]
+        trailing = content[len(content.rstrip('\n')):]
+        return leading + body + trailing
+
+    def clean_chunk_with_gemini(self, content: str) -> str:
+        """Send a single chunk to Gemini, returning it unchanged if it cannot be cleaned."""
+        if len(content) > self.gemini_chunk_size:
+            self.log("[yellow]Content too large for Gemini, returning original[/yellow]")
             return content
             
         try:
             # Load and render the prompt template
-            template = self.jinja_env.get_template('technical_docs_converter.jinja')
+            template_name = 'technical_docs_converter.jinja'
+            template, template_source = _load_prompt_template(template_name)
+            
+            cache_key = None
+            if self.gemini_cache:
+                cache_key = self.gemini_cache.make_key(template_name, template_source, self.model_name, content)
+                cached = self.gemini_cache.get(cache_key)
+                if cached:
+                    self.metrics.increment('gemini_cache_hits')
+                    return cached['text']
+            
             prompt = template.render(content=content)
             
-            # Generate content using Gemini
-            response = self.model.generate_content(prompt)
-            return response.text if response.text else content
+            # Generate content using Gemini, within the client-side rate limit
+            wait_start = time.perf_counter()
+            with self.gemini_scheduler.slot(GEMINI_API_URL):
+                self.metrics.record_stage('gemini_rate_limit', time.perf_counter() - wait_start)
+                with self.metrics.stage('gemini_request'):
+                    response = self.model.generate_content(prompt)
+            self.metrics.increment('gemini_requests')
+            if not response.text:
+                return content
+            if cache_key:
+                self.gemini_cache.set(cache_key, {'text': response.text})
+            return response.text
         except Exception as e:
-            print(f"[yellow]Gemini processing error: {e}[/yellow]")
+            self.log(f"[yellow]Gemini processing error: {e}[/yellow]")
+            self.metrics.increment('gemini_errors')
             return content
 
-    def post_process_markdown(self, content, generate_toc=False):
-        """Post-process the markdown content to improve formatting and readability."""
+    def post_process_markdown(self, content, generate_toc=False, line_mode=None):
+        """Post-process the markdown content to improve formatting and readability.
+
+        By default the fixes run as whole-document regex passes. With `line_mode` (or the
+        converter's `line_post_processing` setting) they run in a single pass over the
+        lines that leaves fenced code blocks untouched.
+        """
         if not content:
             return content
+        
+        with self.metrics.stage('post_process'):
+            return self._post_process_markdown(content, generate_toc, line_mode)
+
+    def _post_process_markdown(self, content, generate_toc, line_mode):
+        if line_mode is None:
+            line_mode = self.line_post_processing
+        if line_mode:
+            return self._post_process_lines(content, generate_toc)
 
-        # Fix escaped characters
-        content = re.sub(r'\\\-', '-', content)  # Fix escaped hyphens
-        content = re.sub(r'\\\|', '|', content)  # Fix escaped pipes in tables
-        content = re.sub(r'\\([#\[\]\(\)\*\_\~])', r'\1', content)  # Fix other common escaped characters
+        # Fix escaped characters (hyphens, pipes in tables and other common ones)
+        if '\\' in content:
+            content = ESCAPED_CHAR_RE.sub(r'\1', content)
         
         # Normalize section spacing (ensure exactly two newlines between sections)
-        content = re.sub(r'\n{3,}', '\n\n', content)
+        content = EXTRA_NEWLINES_RE.sub('\n\n', content)
         
         # Fix link formatting
-        content = re.sub(r'\[([^\]]+)\]\(([^\)]+)\)', lambda m: f'[{m.group(1).strip()}](#)', content)  # Sanitize links
+        if '](' in content:
+            content = LINK_RE.sub(lambda m: f'[{m.group(1).strip()}](#)', content)  # Sanitize links
         
         # Fix code block formatting
-        content = re.sub(r'```\s*(\w+)\s*\n', r'```\1\n', content)  # Normalize language tags
-        content = re.sub(r'```\n\n+', '```\n', content)  # Remove extra newlines after opening
-        content = re.sub(r'\n\n+```', '\n```', content)  # Remove extra newlines before closing
+        if '```' in content:
+            content = FENCE_LANGUAGE_RE.sub(r'```\1\n', content)  # Normalize language tags
+            content = FENCE_OPENING_BLANK_RE.sub('```\n', content)  # Remove extra newlines after opening
+            content = FENCE_CLOSING_BLANK_RE.sub('\n```', content)  # Remove extra newlines before closing
         
         # Fix list formatting
-        content = re.sub(r'^(\s*[-\*\+])\s+', r'\1 ', content, flags=re.MULTILINE)  # Normalize list item spacing
-        content = re.sub(r'(\n\s*[-\*\+] [^\n]+)(\n\s*[-\*\+])', r'\1\n\2', content)  # Add newline between items
+        content = LIST_MARKER_RE.sub(r'\1 ', content)  # Normalize list item spacing
+        content = LIST_ITEM_PAIR_RE.sub(r'\1\n\2', content)  # Add newline between items
         
         # Fix table formatting
-        content = re.sub(r'\|\s+\|', '|', content)  # Remove extra spaces in empty cells
-        content = re.sub(r'\s+\|', ' |', content)   # Normalize spacing before pipes
-        content = re.sub(r'\|\s+', '| ', content)   # Normalize spacing after pipes
+        if '|' in content:
+            content = TABLE_EMPTY_CELL_RE.sub('|', content)  # Remove extra spaces in empty cells
+            content = TABLE_PIPE_BEFORE_RE.sub(' |', content)  # Normalize spacing around pipes
+            content = TABLE_PIPE_AFTER_RE.sub('| ', content)
         
         # Fix heading formatting
-        content = re.sub(r'^(#+)([^#\s])', r'\1 \2', content, flags=re.MULTILINE)  # Ensure space after #
-        content = re.sub(r'^(#+\s.*?)#+\s*$', r'\1', content, flags=re.MULTILINE)  # Remove trailing #
+        content = HEADING_SPACE_RE.sub(r'#\1 \2', content)  # Ensure space after #
+        content = HEADING_TRAILING_RE.sub(r'#\1', content)  # Remove trailing #
         
         if generate_toc:
-            # Generate table of contents
-            headers = []
-            for line in content.split('\n'):
-                if line.startswith('#'):
-                    level = len(re.match(r'^#+', line).group())
-                    title = line.lstrip('#').strip()
-                    if level <= 3:  # Only include up to H3 in TOC
-                        anchor = re.sub(r'[^\w\- ]', '', title.lower()).replace(' ', '-')
-                        headers.append((level, title, anchor))
-            
-            if headers:
-                toc = ['# Table of Contents\n']
-                for level, title, anchor in headers:
-                    indent = '  ' * (level - 1)
-                    toc.append(f'{indent}- [{title}](#{anchor})')
-                
+            toc = self._build_toc(HEADING_LINE_RE.findall(content))
+            if toc:
                 # Insert TOC after the first heading
                 first_heading_end = content.find('\n', content.find('#'))
                 if first_heading_end != -1:
-                    content = content[:first_heading_end + 1] + '\n' + '\n'.join(toc) + '\n\n' + content[first_heading_end + 1:]
+                    content = content[:first_heading_end + 1] + '\n' + toc + '\n\n' + content[first_heading_end + 1:]
         
         return content.strip()
 
-    def convert_page(self, url, depth=0):
-        """Convert a single page to markdown."""
-        print(f"{'  ' * depth}Converting: {url}")
+    def _build_toc(self, heading_lines):
+        """Build a table of contents from heading lines, up to H3."""
+        toc = []
+        for line in heading_lines:
+            level = len(HEADING_LEVEL_RE.match(line).group())
+            title = line.lstrip('#').strip()
+            if level <= 3:  # Only include up to H3 in TOC
+                toc.append(f'{"  " * (level - 1)}- [{title}](#{heading_anchor(title)})')
+        if not toc:
+            return None
+        return '\n'.join(['# Table of Contents\n'] + toc)
+
+    def _post_process_lines(self, content, generate_toc=False):
+        """Apply the post-processing fixes line by line, skipping fenced code blocks."""
+        lines = []
+        headings = []
+        first_heading = None
+        fence = None
+        after_opening = False
+        previous_item = False
         
-        # Use session for connection pooling
-        soup = self.get_page_content(url)
-        if not soup:
-            return set()
+        for line in content.split('\n'):
+            match = FENCE_RE.match(line) if '```' in line or '~~~' in line else None
+            if fence:
+                if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence):
+                    # Remove extra newlines before the closing fence
+                    while lines and not lines[-1].strip():
+                        lines.pop()
+                    fence = None
+                    lines.append(line.rstrip())
+                elif line.strip() or not after_opening:
+                    # Remove extra newlines after the opening fence
+                    lines.append(line)
+                    after_opening = False
+                continue
+            
+            if match:
+                fence = match.group(1)
+                after_opening = True
+                lines.append(LINE_FENCE_LANGUAGE_RE.sub(r'\1\2', line.rstrip()))  # Normalize language tags
+                previous_item = False
+                continue
+            
+            if not line.strip():
+                # Normalize section spacing (at most one blank line)
+                if lines and lines[-1]:
+                    lines.append('')
+                previous_item = False
+                continue
+            
+            if '\\' in line:
+                if line.lstrip().startswith('|'):
+                    line = LINE_TABLE_ESCAPED_CHAR_RE.sub(r'\1', line)
+                else:
+                    line = ESCAPED_CHAR_RE.sub(r'\1', line)
+            if '](' in line:
+                line = LINK_RE.sub(lambda m: f'[{m.group(1).strip()}](#)', line)
+            
+            if line.startswith('#'):
+                line = HEADING_SPACE_RE.sub(r'#\1 \2', line)
+                line = LINE_HEADING_TRAILING_RE.sub(r'\1', line)
+                if first_heading is None:
+                    first_heading = len(lines)
+                headings.append(line)
+            
+            stripped = line.lstrip()
+            is_item = stripped[0] in '-*+'
+            if is_item and not (stripped[1:2] == ' ' and stripped[2:3] not in ' \t'):
+                # Only markers not followed by exactly one space need normalizing
+                line = LINE_LIST_MARKER_RE.sub(r'\1 ', line)
+                is_item = bool(LINE_LIST_ITEM_RE.match(line))
+            if is_item and previous_item:
+                lines.append('')  # Add newline between items
+            previous_item = is_item
+            
+            if '|' in line and ('  ' in line or '\t' in line):
+                # Normalize spacing around pipes, keeping empty cells so columns stay aligned.
+                # Single spaces are already normal, so only runs or tabs need the passes.
+                line = LINE_TABLE_PIPE_BEFORE_RE.sub(' |', line)
+                line = LINE_TABLE_PIPE_AFTER_RE.sub('| ', line)
+            
+            lines.append(line)
+        
+        if generate_toc and first_heading is not None:
+            toc = self._build_toc(headings)
+            if toc:
+                toc_lines = [''] + toc.split('\n')
+                if first_heading + 1 < len(lines) and lines[first_heading + 1]:
+                    toc_lines.append('')
+                lines[first_heading + 1:first_heading + 1] = toc_lines
+        
+        return '\n'.join(lines).strip()
 
-        # Process content in parallel where possible
-        title_text = self.get_page_title(soup, url)
-        content = self.clean_content(soup)
-        links = self.extract_links(soup, url)
+    def render_page(self, url, depth=0):
+        """Fetch a page and render its markdown section without writing it anywhere."""
+        self.log(f"{'  ' * depth}Converting: {url}")
         
-        # Generate markdown
-        header_prefix = '#' * (depth + 1) if depth < 6 else '######'
-        raw_markdown = f"{header_prefix} {title_text}\n\nSource: {url}\n\n{md(str(content))}\n\n---\n\n"
+        # Use session for connection pooling
+        html = self.fetch_page(url)
+        if html is None:
+            return None, []
+        
+        # Reuse the previous section when the page HTML is unchanged
+        gemini = self.model is not None
+        if self.manifest:
+            html_hash = hashlib.sha256(html.encode('utf-8')).hexdigest()
+            entry = self.manifest.lookup(url, html_hash, depth, gemini)
+            if entry:
+                self.manifest.reuse(url, entry)
+                self.metrics.increment('manifest_reused')
+                return entry['section'], entry['links']
+        
+        if self.duplicates is not None:
+            canonical = self.canonical_alias(html, url)
+            if canonical:
+                wrap = partial(self.page_section, url, depth, self.title_from_url(url))
+                if self.model:
+                    self.metrics.increment('gemini_calls_skipped')
+                return self.alias_section(url, canonical, wrap), [canonical]
+        
+        duplicate = None
+        found = []  # The reference section, when the page turns out to duplicate an earlier one
+        duplicate_check = partial(self.check_page_duplicate, url, depth, found) if self.duplicates is not None else None
         
-        # Clean with Gemini if available (batch process to reduce API calls)
-        if self.model and len(raw_markdown) < 30000:  # Only process if content isn't too large
+        if self.process_pool and url != self.profile_url:
+            # CPU-bound parsing and markdownify run in a worker process
+            raw_markdown, links, stages, fingerprint = self.process_pool.submit(
+                _render_markdown_in_worker, html, url, depth, duplicate_check is not None).result()
+            for name, seconds in stages.items():
+                self.metrics.record_stage(name, seconds)
+            if fingerprint:
+                title, fingerprint = fingerprint
+                duplicate = self.check_duplicate(url, title, fingerprint, partial(self.page_section, url, depth, title))
+                raw_markdown = duplicate or raw_markdown
+        else:
+            # Keep already-visited links when recording, the crawl filters them anyway
+            raw_markdown, links = self.render_markdown(html, url, depth, exclude_visited=not self.manifest,
+                                                       duplicate_check=duplicate_check)
+            duplicate = found[0] if found else None
+        
+        if duplicate:
+            # Duplicates are not recorded in the manifest, their original may change independently
+            if self.model:
+                self.metrics.increment('gemini_calls_skipped')
+            return duplicate, links
+        
+        # Clean with Gemini if available (large pages are split into chunks)
+        if self.model:
             try:
-                markdown_content = self.clean_markdown_with_gemini(raw_markdown)
+                with self.metrics.stage('gemini'):
+                    markdown_content = self.clean_markdown_with_gemini(raw_markdown)
             except Exception as e:
-                print(f"[yellow]Using raw markdown due to Gemini error: {e}[/yellow]")
+                self.log(f"[yellow]Using raw markdown due to Gemini error: {e}[/yellow]")
                 markdown_content = raw_markdown
         else:
             markdown_content = raw_markdown
         
-        # Batch write to file
-        with open(f"{self.domain}_docs.md", 'a', encoding='utf-8') as f:
-            f.write(markdown_content)
+        if self.manifest:
+            self.manifest.record(url, html_hash, depth, gemini, markdown_content, links)
         
-        return links
+        return markdown_content, links
 
-    def convert_all_docs(self):
-        """Convert all documentation pages to markdown using BFS traversal with optimizations."""
-        print(f"Starting documentation conversion from {self.base_url}")
-        print(f"Gemini API {'enabled' if self.model else 'disabled'} for content cleanup")
+    def render_markdown(self, html, url, depth=0, exclude_visited=True, duplicate_check=None):
+        """Render the raw markdown section and outgoing links of a fetched page.
+
+        `duplicate_check(title, content)` runs between cleaning and markdownify. When it
+        returns a section, that section is used and the page is not converted.
+        """
+        title_text, content, links = self.parse_page(html, url, exclude_visited=exclude_visited)
+        if duplicate_check is not None:
+            reference = duplicate_check(title_text, content)
+            if reference is not None:
+                return reference, links
         
-        # Initialize output file
-        with open(f"{self.domain}_docs.md", 'w', encoding='utf-8') as f:
-            f.write(f"# {self.domain} Documentation\n\n")
-            f.write(f"Generated from: {self.base_url}\n\n---\n\n")
+        # Generate markdown
+        with self.metrics.stage('markdownify'):
+            body = _markdownify(str(content))
+        return self.page_section(url, depth, title_text, body), links
+
+    def page_section(self, url, depth, title, body):
+        """Format a page's section for `convert_all_docs`, with a heading level that follows the crawl depth."""
+        header_prefix = '#' * (depth + 1) if depth < 6 else '######'
+        return f"{header_prefix} {title}\n\nSource: {url}\n\n{body}\n\n---\n\n"
+
+    def canonical_alias(self, html, url):
+        """Return the in-scope canonical URL a page declares with `<link rel="canonical">`, if it isn't the page itself."""
+        link = CANONICAL_LINK_RE.search(html)
+        href = link and HREF_ATTR_RE.search(link.group())
+        if not href:
+            return None
+        canonical = self.normalize_url(urljoin(url, next(value for value in href.groups() if value is not None)))
+        if canonical == url or not self.is_valid_url(canonical):
+            return None
+        return canonical
+
+    def page_fingerprint(self, content):
+        """Fingerprint a page's cleaned main content for duplicate detection."""
+        with self.metrics.stage('dedupe'):
+            return self.duplicates.fingerprint(content.get_text(' ', strip=True))
+
+    def check_duplicate(self, url, title, fingerprint, wrap):
+        """Register a crawled page's fingerprint and return a reference section if an earlier page matches.
+
+        `wrap(body)` formats the page's section around the reference. The answer here
+        lets fetch threads skip work early; `resolve_duplicate` makes the final call in
+        crawl order, once every earlier page has been registered.
+        """
+        order = self._page_order.get(url)
+        if fingerprint is None or order is None:
+            return None
+        self.duplicates.add(order, url, title, fingerprint)
+        self._page_duplicates[url] = (fingerprint, order, wrap)
+        original = self.duplicates.find_original(fingerprint, order)
+        return wrap(self.duplicate_note(*original)) if original else None
+
+    def check_page_duplicate(self, url, depth, found, title, content):
+        """`render_markdown` duplicate check for a page rendered in this process.
+
+        Fingerprints the cleaned content and returns the reference section if an earlier
+        page matches, also appending it to `found`.
+        """
+        reference = self.check_duplicate(url, title, self.page_fingerprint(content),
+                                         partial(self.page_section, url, depth, title))
+        if reference:
+            found.append(reference)
+        return reference
+
+    def alias_section(self, url, canonical, wrap):
+        """Return the reference section of a page whose canonical URL is another page."""
+        self._page_duplicates[url] = (None, canonical, wrap)
+        return wrap(self.duplicate_note(canonical, None))
+
+    def duplicate_note(self, url, title):
+        if title is None:
+            return f"Canonical version: {url}"
+        return f"Same content as [{title}](#{heading_anchor(title)}) ({url})"
+
+    def resolve_duplicate(self, url, output):
+        """Return a finished page's output, replaced by a reference if it duplicates an earlier page.
+
+        Called in crawl order, so which page is kept doesn't depend on thread timing.
+        References point at the original page, following chains of duplicates.
+        """
+        self._page_order.pop(url, None)
+        info = self._page_duplicates.pop(url, None)
+        if info is None or output is None:
+            return output
+        fingerprint, target, wrap = info
+        if fingerprint is None:
+            original = (target, None)
+        else:
+            original = self.duplicates.find_original(fingerprint, target)
+            if original is None:
+                return output
+            original = self._duplicate_targets.get(original[0], original)
+        self._duplicate_targets[url] = original
+        self.metrics.increment('duplicate_pages')
+        return wrap(self.duplicate_note(*original))
+
+    def start_process_pool(self):
+        """Start the render worker processes used by `render_page` when `workers` is set."""
+        if self.workers and not self.process_pool:
+            settings = {
+                'base_url': self.base_url,
+                'domain': self.domain,
+                'max_depth': self.max_depth,
+                'parser_backend': self.parser_backend,
+                'follow_links': self.follow_links,
+                'dedupe': self.duplicates is not None,
+                'dedupe_threshold': self.duplicates.threshold if self.duplicates else 0.85,
+                'quiet': self.quiet,
+                'exclude_selectors': list(self.exclude_selectors),
+            }
+            self.process_pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_render_worker,
+                initargs=(settings,)
+            )
+
+    def stop_process_pool(self):
+        if self.process_pool:
+            self.process_pool.shutdown(cancel_futures=True)
+            self.process_pool = None
+
+    def convert_page(self, url, depth=0):
+        """Convert a single page to markdown."""
+        markdown_content, links = self.render_page(url, depth)
+        if markdown_content is None:
+            return []
         
-        # Use deque for efficient queue operations
-        queue = deque([(self.base_url, 0)])
-        self.visited_urls = set()  # Use set for O(1) lookups
-        total_pages = 0
-        batch_size = 10  # Process pages in batches
+        with open(f"{self.output_prefix}.md", 'a', encoding='utf-8') as f:
+            f.write(markdown_content)
+        
+        return links
+
+    def crawl(self, process, frontier=None):
+        """Run `process(url, depth)` concurrently over the site and yield results in BFS order.
+
+        `process` must return an `(output, links)` tuple. Pages are fetched by a bounded
+        thread pool, while results are consumed in the order their URLs were enqueued, so
+        the frontier grows exactly as it would in a sequential breadth-first crawl.
+        `frontier` replaces `initial_frontier()` as the starting queue of `(url, depth)` pairs.
+        """
+        # URLs are marked visited when queued, so each one is queued at most once
+        queue = Frontier()
+        for url, depth in (frontier if frontier is not None else self.initial_frontier()):
+            url = self.normalize_url(url)
+            if url not in self.visited_urls:
+                self.visited_urls.add(url)
+                queue.append((url, depth))
+        pending = deque()
+        self._crawl_queue, self._crawl_pending = queue, pending
+        pages_converted = 0
+        sequence = 0
+        # With worker processes, extra threads wait on renders while others keep fetching
+        threads = self.concurrency + (self.workers or 0) if self.process_pool else self.concurrency
+        max_in_flight = threads * 2  # Keep workers busy while the head page finishes
+        executor = ThreadPoolExecutor(max_workers=threads)
         
         try:
-            while queue:
-                # Process pages in batches for better performance
-                batch = []
-                while queue and len(batch) < batch_size:
+            while queue or pending:
+                while queue and len(pending) < max_in_flight:
                     url, depth = queue.popleft()
-                    normalized_url = self.normalize_url(url)
-                    if normalized_url not in self.visited_urls:
-                        batch.append((normalized_url, depth))
-                        self.visited_urls.add(normalized_url)
+                    if self.duplicates is not None:
+                        # Crawl order for duplicate detection, dropped again in resolve_duplicate
+                        self._page_order[url] = sequence
+                        sequence += 1
+                    pending.append((url, depth, executor.submit(self._run_page, process, url, depth)))
+                
+                if not pending:
+                    continue
+                
+                url, depth, future = pending[0]
+                try:
+                    output, links = future.result()
+                except Exception as e:
+                    self.log(f"Error converting {url}: {str(e)}")
+                    self.metrics.increment('page_errors')
+                    output, links = None, []
+                if self.duplicates is not None:
+                    output = self.resolve_duplicate(url, output)
+                # Only leave the frontier once finished, so an interrupted wait keeps the page
+                self._crawl_current = (url, depth)
+                pending.popleft()
                 
-                # Process batch
-                for url, depth in batch:
-                    new_urls = self.convert_page(url, depth)
-                    
-                    # Add new URLs to queue
-                    for new_url in new_urls:
-                        if new_url not in self.visited_urls:
-                            queue.append((new_url, depth + 1))
-                    
-                    total_pages += 1
-                    
-                # Small delay between batches to be nice to the server
-                if batch:
-                    time.sleep(1)
-            
-            print(f"\nConversion complete!")
-            print(f"Total pages processed: {total_pages}")
-            print(f"Documentation has been saved to: {self.domain}_docs.md")
+                for link in links:
+                    if link not in self.visited_urls:
+                        self.visited_urls.add(link)
+                        queue.append((link, depth + 1))
+                
+                if output is not None:
+                    pages_converted += 1
+                    self.metrics.increment('pages_converted')
+                self.report_progress(
+                    pages_fetched=self.pages_fetched,
+                    pages_converted=pages_converted,
+                    queue_depth=len(queue) + len(pending),
+                )
+                yield url, depth, output
+                self._crawl_current = None
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run_page(self, process, url, depth):
+        """Run `process` for one page, recording its metrics and profiling it if it is `profile_url`."""
+        with self.metrics.page(url, depth):
+            if url != self.profile_url:
+                return process(url, depth)
+            
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(process, url, depth)
+            finally:
+                profile_path = f"{self.domain}_profile.prof"
+                profiler.dump_stats(profile_path)
+                stats = io.StringIO()
+                pstats.Stats(profiler, stream=stats).sort_stats('cumulative').print_stats(25)
+                self.log(f"\nProfile of {url} (saved to {profile_path}):\n{stats.getvalue()}")
+
+    def crawl_frontier(self, last=None):
+        """Return the `(url, depth)` pairs the running or interrupted crawl has yet to finish, in order.
+
+        With `last`, only the last `last` pairs are returned, without copying the whole queue.
+        """
+        if last is not None and last <= len(self._crawl_queue):
+            return self._crawl_queue.tail(last)
+        frontier = [self._crawl_current] if self._crawl_current else []
+        frontier.extend((url, depth) for url, depth, future in self._crawl_pending)
+        frontier.extend(self._crawl_queue)
+        return frontier if last is None else frontier[len(frontier) - last:]
+
+    def crawl_position(self):
+        """Return `(queued, finished)`: how many URLs the crawl has queued, and how many of those,
+        from the front of the queue, it has finished. The rest are `crawl_frontier()`.
+        """
+        queued = self._crawl_queue.appended
+        unfinished = len(self._crawl_queue) + len(self._crawl_pending) + (self._crawl_current is not None)
+        return queued, queued - unfinished
+
+    def print_gemini_cache_stats(self):
+        if self.gemini_cache:
+            self.log(f"Gemini cache: {self.gemini_cache.hits} hits, {self.gemini_cache.misses} misses")
+
+    def convert_all_docs(self, resume=False):
+        """Convert all documentation pages to markdown using a concurrent BFS crawl.
+
+        Progress is checkpointed every `checkpoint_interval` pages (uncompressed output
+        only). With `resume=True`, an interrupted crawl continues from its last checkpoint
+        instead of starting over. With `split_dir`, each page is written to its own file
+        there (see `PageTreeSink`) and the combined file is only produced when
+        `combine_split` is set, by concatenating the page files at the end.
+        """
+        self.log(f"Starting documentation conversion from {self.base_url}")
+        self.log(f"Gemini API {'enabled' if self.model else 'disabled'} for content cleanup")
+        
+        checkpoint = None
+        state = None
+        output_path = f"{self.output_prefix}.md"
+        header = f"# {self.domain} Documentation\n\nGenerated from: {self.base_url}\n\n---\n\n"
+        if self.split_dir:
+            # Compression only applies to the combined file, the page files can always resume
+            checkpoint_path = Path(self.split_dir) / 'checkpoint.sqlite'
+            Path(self.split_dir).mkdir(parents=True, exist_ok=True)
+        else:
+            checkpoint_path = f"{self.output_prefix}.checkpoint.sqlite"
+        if self.checkpoint_interval and (self.split_dir or not self.compression):
+            checkpoint = CrawlCheckpoint(checkpoint_path)
+            if resume:
+                state = checkpoint.load(self.base_url, self.max_depth)
+                if state is None:
+                    self.log("No checkpoint to resume from, starting a new crawl")
+            if state is None:
+                checkpoint.reset()
+        elif resume:
+            self.log("Checkpoints are only kept for uncompressed output, starting a new crawl")
+        
+        if self.incremental:
+            self.manifest = ConversionManifest(f"{self.output_prefix}.manifest.json", log=self.log)
+        
+        if state:
+            frontier, converted, offset, total_pages = state
+            self.log(f"Resuming after {total_pages} pages with {len(frontier)} URLs left in the frontier")
+            if self.split_dir:
+                sink = PageTreeSink(self.split_dir, self.base_url, resume_offset=offset)
+            else:
+                sink = OutputSink(output_path, resume_offset=offset, first_index=total_pages)
+            self.visited_urls = self.new_visited_set(converted)
+            if self.manifest:
+                # Pages converted before the interruption still belong to this run
+                for url in converted:
+                    if url in self.manifest.previous:
+                        self.manifest.pages[url] = self.manifest.previous[url]
+        else:
+            # Initialize output file
+            frontier = None
+            if self.split_dir:
+                sink = PageTreeSink(self.split_dir, self.base_url)
+            else:
+                sink = OutputSink(output_path, compression=self.compression)
+                sink.write(header)
+            self.visited_urls = self.new_visited_set()
+            total_pages = 0
+        last_done = None
+        saved = 0  # Queue positions this run has written to the checkpoint
+        
+        def save_checkpoint():
+            nonlocal saved
+            queued, finished = self.crawl_position()
+            if self._crawl_current and self._crawl_current[0] == last_done:
+                finished += 1  # The current page is already in the output
+            # Only the URLs queued since the last save are written, the first save of a
+            # run writes the whole frontier over the one it resumed from
+            appended_at = max(saved, finished)
+            checkpoint.save(self.base_url, self.max_depth, finished, appended_at,
+                            self.crawl_frontier(last=queued - appended_at), sink.flush(), total_pages)
+            saved = queued
+        
+        try:
+            if self.workers:
+                self.log(f"Rendering pages in {self.workers} worker processes")
+                self.start_process_pool()
+            
+            for url, depth, markdown_content in self.crawl(self.render_page, frontier):
+                with self.metrics.stage('write'):
+                    if self.split_dir:
+                        sink.write_page(url, depth, markdown_content)
+                    else:
+                        sink.submit(total_pages, markdown_content)
+                total_pages += 1
+                if checkpoint:
+                    checkpoint.page_done(url)
+                    last_done = url
+                    if total_pages % self.checkpoint_interval == 0:
+                        save_checkpoint()
+            if self.split_dir:
+                with self.metrics.stage('write'):
+                    self.log(f"Table of contents saved to: {sink.write_toc(f'{self.domain} Documentation')}")
+                    if self.combine_split:
+                        self.log(f"Combined documentation saved to: {sink.combine(output_path, header, self.compression)}")
+            sink.close()
+            if checkpoint:
+                checkpoint.discard()
+            
+            self.log(f"\nConversion complete!")
+            self.log(f"Total pages processed: {total_pages}")
+            self.print_gemini_cache_stats()
+            if self.manifest:
+                removed = self.manifest.save()
+                self.log(f"Unchanged pages reused: {self.manifest.reused}")
+                self.log(f"Pages removed since last run: {len(removed)}")
+            self.log(f"Documentation has been saved to: {sink.path}")
+            self.log(f"\n{self.metrics.summary()}")
             
         except KeyboardInterrupt:
-            print("\nConversion interrupted by user")
-            print(f"Partial documentation saved to: {self.domain}_docs.md")
-            print(f"Pages processed: {total_pages}")
+            if checkpoint:
+                save_checkpoint()
+            self.log("\nConversion interrupted by user")
+            if self.manifest:
+                self.manifest.save(complete=False)
+            self.log(f"Partial documentation saved to: {sink.path}")
+            self.log(f"Pages processed: {total_pages}")
+            if checkpoint:
+                self.log("Run again with --resume to continue from here")
+            self.log(f"\n{self.metrics.summary()}")
+        finally:
+            # Any other error still flushes the buffered output and closes the checkpoint
+            # database, batch runs catch it and go on with the next site
+            self.stop_process_pool()
+            try:
+                sink.close()
+            finally:
+                if checkpoint:
+                    checkpoint.close()
+                self.metrics.close()
 
-    def convert(self):
-        """Convert documentation to markdown with linked pages."""
+    def render_section(self, url, depth):
+        """Fetch a page and render the section used by `convert`."""
+        self.log(f"\nProcessing page: {url}")
+        html = self.fetch_page(url)
+        
+        if html is None:
+            self.log(f"Failed to get content for {url}")
+            return None, []
+        
+        can_follow = self.max_depth is None or depth < self.max_depth
+        if self.duplicates is not None:
+            canonical = self.canonical_alias(html, url)
+            if canonical:
+                self.log(f"Canonical version is {canonical}")
+                wrap = partial(self.section_text, url, self.title_from_url(url))
+                return self.alias_section(url, canonical, wrap), [canonical] if can_follow else []
+        
+        # Clean content by removing navigation and empty elements
+        self.log("Cleaning content...")
+        title, main_content, page_links = self.parse_page(html, url, title_after_clean=True)
+        
+        if self.duplicates is not None:
+            fingerprint = self.page_fingerprint(main_content)
+            reference = self.check_duplicate(url, title or url, fingerprint, partial(self.section_text, url, title or url))
+            if reference is not None:
+                self.log("Same content as an earlier page")
+                return reference, page_links if can_follow else []
+        
+        # Convert main content to markdown
+        self.log("Converting to markdown...")
+        with self.metrics.stage('markdownify'):
+            content = _markdownify(str(main_content))
+        
+        if not content:
+            self.log("No content after conversion")
+            return None, []
+        
+        # Post-process markdown
+        self.log("Post-processing markdown...")
+        content = self.post_process_markdown(content)
+        
+        # Add page title and source
+        section = self.section_text(url, title or url, content)
+        
+        # Extract and process links if within depth limit
+        links = []
+        if can_follow:
+            self.log(f"Extracting links from {url}")
+            links = page_links
+        
+        return section, links
+
+    def section_text(self, url, title, content):
+        """Format a page's section for `convert`."""
+        return f"\n## {title}\n\nSource: {url}\n\n{content}\n\n---\n"
+
+    def iter_sections(self):
+        """Yield the converted document piece by piece, keeping memory flat for large sites.
+
+        The header comes first, followed by one section per page in BFS order. When Gemini
+        is enabled, each section is cleaned on its own rather than as part of the whole
+        document.
+        """
+        yield f"# {self.domain} Documentation\n\nGenerated from: {self.base_url}\n\n---\n\n"
+        
+        separator = ""
+        for url, depth, section in self.crawl(self.render_section):
+            if section is None:
+                continue
+            if self.model:
+                if url in self._duplicate_targets:
+                    self.metrics.increment('gemini_calls_skipped')
+                else:
+                    with self.metrics.stage('gemini'):
+                        section = self.clean_markdown_with_gemini(section)
+            yield separator + section
+            separator = "\n"
+
+    def convert(self, stream=False):
+        """Convert documentation to markdown with linked pages.
+
+        With `stream=True`, returns the iterator from `iter_sections` instead of one string.
+        """
+        if stream:
+            return self.iter_sections()
+        
         try:
-            print(f"\nStarting conversion of {self.base_url}")
-            queue = deque([(self.base_url, 0)])
+            self.log(f"\nStarting conversion of {self.base_url}")
             markdown_sections = []
             
-            while queue:
-                url, depth = queue.popleft()
-                normalized_url = self.normalize_url(url)
-                
-                if normalized_url in self.visited_urls:
-                    continue
-                    
-                print(f"\nProcessing page: {url}")
-                self.visited_urls.add(normalized_url)
-                soup = self.get_page_content(url)
-                
-                if not soup:
-                    print(f"Failed to get content for {url}")
-                    continue
-                
-                # Clean content by removing navigation elements
-                print("Cleaning content...")
-                for selector in self.exclude_selectors:
-                    for element in soup.select(selector):
-                        element.decompose()
-                
-                # Find main content
-                main_content = (
-                    soup.find('main') or 
-                    soup.find('article') or 
-                    soup.find('div', {'class': ['content', 'main', 'document', 'documentation']}) or 
-                    soup.find('div', {'role': 'main'}) or
-                    soup
-                )
-                
-                # Convert main content to markdown
-                print("Converting to markdown...")
-                content = md(str(main_content))
-                
-                if not content:
-                    print("No content after conversion")
-                    continue
-                
-                # Post-process markdown
-                print("Post-processing markdown...")
-                content = self.post_process_markdown(content)
-                
-                # Add page title and source
-                title = self.get_page_title(soup, url) or url
-                section = f"\n## {title}\n\nSource: {url}\n\n{content}\n\n---\n"
-                markdown_sections.append(section)
-                
-                # Extract and process links if within depth limit
-                if self.max_depth is None or depth < self.max_depth:
-                    print(f"Extracting links from {url}")
-                    links = self.extract_links(soup, url)
-                    for link in links:
-                        if link not in self.visited_urls:
-                            print(f"Found new link: {link}")
-                            queue.append((link, depth + 1))
-                
-                # Small delay between pages to be nice to the server
-                time.sleep(0.5)
+            for url, depth, section in self.crawl(self.render_section):
+                if section is not None:
+                    markdown_sections.append(section)
             
             if not markdown_sections:
-                print("No content was converted")
+                self.log("No content was converted")
                 return None
             
             # Combine all sections
-            print("\nCombining all sections...")
+            self.log("\nCombining all sections...")
             final_content = f"# {self.domain} Documentation\n\nGenerated from: {self.base_url}\n\n---\n\n"
             final_content += "\n".join(markdown_sections)
             
             # Use Gemini if available
             if self.model:
-                print("\nUsing Gemini for enhancement...")
-                final_content = self.clean_markdown_with_gemini(final_content)
+                self.log("\nUsing Gemini for enhancement...")
+                with self.metrics.stage('gemini'):
+                    final_content = self.clean_markdown_with_gemini(final_content)
             
-            print(f"\nConversion complete!")
-            print(f"Pages processed: {len(markdown_sections)}")
-            print(f"Total content length: {len(final_content)}")
+            self.log(f"\nConversion complete!")
+            self.log(f"Pages processed: {len(markdown_sections)}")
+            self.log(f"Total content length: {len(final_content)}")
+            self.print_gemini_cache_stats()
+            self.log(f"\n{self.metrics.summary()}")
             
             return final_content
             
         except Exception as e:
-            print(f"\nError during conversion: {str(e)}")
+            self.log(f"\nError during conversion: {str(e)}")
             import traceback
-            print(traceback.format_exc())
+            self.log(traceback.format_exc())
             return None
 
+# Per-site settings a batch URL file may set after the URL, e.g. `max_depth=2 max_rps=1`
+SITE_OPTIONS = {'max_depth': int, 'max_rps': float, 'host_concurrency': int, 'concurrency': int}
+
+def read_site_list(path):
+    """Read a batch URL file: one base URL per line, optionally followed by `key=value` site options.
+
+    Blank lines and lines starting with `#` are skipped. Returns `(url, options)` pairs.
+    """
+    sites = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            options = {}
+            for field in fields[1:]:
+                key, _, value = field.partition('=')
+                if key not in SITE_OPTIONS or not value:
+                    raise ValueError(f"{path}:{line_number}: unknown site option {field!r}, "
+                                     f"expected one of {', '.join(SITE_OPTIONS)}")
+                options[key] = SITE_OPTIONS[key](value)
+            sites.append((fields[0], options))
+    return sites
+
+class BatchConverter:
+    """Converts many documentation sites concurrently in one process.
+
+    Every site gets its own `DocsConverter`, output files, checkpoint and politeness
+    limits (`options` plus the site's own overrides). The HTTP session and its connection
+    pools, the response and Gemini caches, the Gemini model and one Gemini rate budget
+    are shared by all sites. Sites on the same host share that host's scheduler, so
+    crawling them together stays within the limits of the first one started.
+
+    Progress is reported for the whole batch every `progress_interval` seconds. The
+    outcome of each site is kept in `batch_summary.json` in `output_dir`, which lets
+    `run(resume=True)` skip sites that already finished. With `quiet`, the sites' own
+    crawl logs are turned off so only the batch progress is printed.
+    """
+
+    SUMMARY_NAME = 'batch_summary.json'
+
+    def __init__(self, sites, output_dir='.', site_concurrency=4, gemini_api_key=None, gemini_rpm=60,
+                 gemini_concurrency=4, cache_dir=None, cache_max_bytes=512 * 1024 * 1024,
+                 gemini_cache_dir=None, gemini_cache_ttl=30 * 24 * 3600, progress_callback=None,
+                 progress_interval=10.0, quiet=True, **options):
+        self.sites = [(site, {}) if isinstance(site, str) else (site[0], dict(site[1])) for site in sites]
+        self.output_dir = Path(output_dir)
+        self.site_concurrency = max(1, site_concurrency)
+        self.options = options
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self.quiet = quiet
+        
+        site_settings = [{**options, **overrides} for url, overrides in self.sites] or [options]
+        pool_maxsize = max(max(settings.get('concurrency', 4), settings.get('host_concurrency', 4))
+                           for settings in site_settings)
+        hosts = {urlparse(url).netloc for url, overrides in self.sites}
+        self.session = create_session(pool_maxsize=pool_maxsize, pool_connections=max(16, len(hosts)))
+        self.response_cache = ResponseCache(cache_dir, cache_max_bytes) if cache_dir else None
+        self.gemini_cache = GeminiCache(gemini_cache_dir, ttl=gemini_cache_ttl) if gemini_cache_dir else None
+        self.model = _gemini_model(gemini_api_key) if gemini_api_key else None
+        self.gemini_concurrency = max(1, gemini_concurrency)
+        self.gemini_scheduler = HostScheduler(max_rps=gemini_rpm / 60.0, max_concurrency=self.gemini_concurrency)
+        
+        self.results = {}
+        self._host_schedulers = {}
+        self._progress = {}
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    def site_prefix(self, url, taken):
+        """Return the output path prefix for a site, e.g. `out/docs.example.com_api`."""
+        parsed = urlparse(url)
+        slug = UNSAFE_FILENAME_RE.sub('_', f"{parsed.netloc}{parsed.path}".rstrip('/')).strip('_')
+        prefix, suffix = slug, 1
+        while prefix in taken:
+            suffix += 1
+            prefix = f"{slug}_{suffix}"
+        taken.add(prefix)
+        return str(self.output_dir / prefix)
+
+    def site_converter(self, url, prefix, overrides):
+        """Build the converter for one site, wired to the resources the batch shares."""
+        settings = {**self.options, **overrides}
+        if settings.get('split_dir'):
+            settings['split_dir'] = str(Path(settings['split_dir']) / Path(prefix).name)
+        converter = DocsConverter(
+            url,
+            session=self.session,
+            gemini_concurrency=self.gemini_concurrency,
+            output_prefix=prefix,
+            progress_callback=partial(self._site_progress, url),
+            quiet=self.quiet,
+            **settings
+        )
+        converter.response_cache = self.response_cache
+        converter.gemini_cache = self.gemini_cache
+        converter.model = self.model
+        converter.gemini_scheduler = self.gemini_scheduler
+        host = urlparse(url).netloc
+        with self._lock:
+            shared = self._host_schedulers.setdefault(host, converter.scheduler)
+        if shared is not converter.scheduler:
+            ignored = [f"{option}={settings[option]}" for option, value in
+                       (('max_rps', shared.max_rps), ('host_concurrency', shared.max_concurrency))
+                       if option in settings and settings[option] != value]
+            if ignored:
+                print(f"Warning: {url} shares {host} with an earlier site, ignoring {', '.join(ignored)} "
+                      f"(using max_rps={shared.max_rps}, host_concurrency={shared.max_concurrency})")
+            converter.scheduler = shared
+        return converter
+
+    def _site_progress(self, url, progress):
+        with self._lock:
+            self._progress[url] = progress
+        if self._stopping:
+            # Unwinds the site's crawl like Ctrl-C would, which checkpoints it
+            raise KeyboardInterrupt
+
+    def convert_site(self, url, prefix, overrides, resume=False):
+        """Convert one site and return its result entry for the batch summary."""
+        result = {'url': url, 'output': f"{prefix}.md", 'status': 'running', 'pages': 0}
+        with self._lock:
+            self.results[url] = result
+        start = time.perf_counter()
+        converter = None
+        try:
+            converter = self.site_converter(url, prefix, overrides)
+            converter.convert_all_docs(resume=resume)
+            # convert_all_docs returns normally after Ctrl-C, leaving the frontier behind
+            result['status'] = 'interrupted' if converter.crawl_frontier() else 'done'
+        except Exception as e:
+            result['status'] = 'failed'
+            result['error'] = str(e)
+        finally:
+            result['seconds'] = round(time.perf_counter() - start, 3)
+            if converter:
+                counters = converter.metrics.snapshot()['counters']
+                result['pages'] = counters.get('pages_converted', 0)
+                result['bytes_fetched'] = counters.get('bytes_fetched', 0)
+                if result['status'] == 'done' and not result['pages']:
+                    result['status'] = 'failed'
+                    result['error'] = 'No pages converted'
+                if converter.split_dir:
+                    result['output'] = converter.split_dir
+                elif converter.compression:
+                    result['output'] += OutputSink.SUFFIXES[converter.compression]
+            self.save_summary()
+        return result
+
+    def progress(self):
+        """Return aggregate progress: sites by status, and pages and queue depth summed over sites."""
+        with self._lock:
+            statuses = [result['status'] for result in self.results.values()]
+            current = list(self._progress.values())
+        return {
+            'sites_total': len(self.sites),
+            'sites_done': statuses.count('done'),
+            'sites_failed': statuses.count('failed'),
+            'sites_interrupted': statuses.count('interrupted'),
+            'sites_running': statuses.count('running'),
+            'sites_queued': statuses.count('queued'),
+            'pages_fetched': sum(progress.get('pages_fetched', 0) for progress in current),
+            'pages_converted': sum(progress.get('pages_converted', 0) for progress in current),
+            'queue_depth': sum(progress.get('queue_depth', 0) for progress in current),
+        }
+
+    def report_progress(self, started):
+        progress = self.progress()
+        progress['elapsed'] = time.perf_counter() - started
+        if self.progress_callback:
+            self.progress_callback(progress)
+        interrupted = f", {progress['sites_interrupted']} interrupted" if progress['sites_interrupted'] else ''
+        print(f"[{progress['elapsed']:6.0f}s] sites: {progress['sites_done']} done, "
+              f"{progress['sites_running']} running, {progress['sites_queued']} queued, "
+              f"{progress['sites_failed']} failed{interrupted} of {progress['sites_total']}; "
+              f"pages: {progress['pages_converted']} converted, {progress['queue_depth']} queued, "
+              f"{progress['pages_converted'] / max(progress['elapsed'], 1e-9):.1f} pages/sec", flush=True)
+
+    def save_summary(self):
+        with self._lock:
+            results = [self.results[url] for url, overrides in self.sites if url in self.results]
+            with open(self.output_dir / self.SUMMARY_NAME, 'w', encoding='utf-8') as f:
+                json.dump({'results': results}, f, indent=2)
+
+    def run(self, resume=False):
+        """Convert every site and return their results in input order.
+
+        With `resume=True`, sites that finished in an earlier run are skipped and the
+        others continue from their checkpoints. Ctrl-C stops all running sites at their
+        next page, checkpointing them, and skips the sites not started yet.
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        previous = {}
+        summary_path = self.output_dir / self.SUMMARY_NAME
+        if resume and summary_path.exists():
+            with open(summary_path, 'r', encoding='utf-8') as f:
+                previous = {result['url']: result for result in json.load(f)['results']}
+        
+        started = time.perf_counter()
+        taken = set()
+        executor = ThreadPoolExecutor(max_workers=self.site_concurrency)
+        futures = []
+        try:
+            for url, overrides in self.sites:
+                prefix = self.site_prefix(url, taken)
+                if previous.get(url, {}).get('status') == 'done':
+                    self.results[url] = previous[url]
+                    continue
+                with self._lock:
+                    self.results[url] = {'url': url, 'output': f"{prefix}.md", 'status': 'queued', 'pages': 0}
+                futures.append(executor.submit(self.convert_site, url, prefix, overrides, resume))
+            
+            remaining = set(futures)
+            while remaining:
+                try:
+                    _, remaining = wait(remaining, timeout=self.progress_interval)
+                except KeyboardInterrupt:
+                    print("\nStopping the batch, running sites are checkpointed", flush=True)
+                    self._stopping = True
+                    for future in futures:
+                        future.cancel()
+                    continue
+                if remaining:
+                    self.report_progress(started)
+        except BaseException:
+            self._stopping = True
+            raise
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            with self._lock:
+                # Sites cancelled before they started run on resume like interrupted ones
+                for result in self.results.values():
+                    if result['status'] == 'queued':
+                        result['status'] = 'interrupted'
+        
+        self.save_summary()
+        self.report_progress(started)
+        return [self.results[url] for url, overrides in self.sites if url in self.results]
+
 def main():
     parser = argparse.ArgumentParser(description='Convert documentation website to markdown')
-    parser.add_argument('url', help='Base URL of the documentation (e.g., https://docs.example.com/)')
+    parser.add_argument('url', nargs='?', help='Base URL of the documentation (e.g., https://docs.example.com/)')
+    parser.add_argument('--batch', metavar='FILE', help='Convert every site listed in FILE (one URL per line, optionally followed by key=value options for max_depth, max_rps, host_concurrency and concurrency) concurrently')
+    parser.add_argument('--output-dir', default='.', help='With --batch, directory for the per-site output files and batch_summary.json (default: current directory)')
+    parser.add_argument('--site-concurrency', type=int, default=4, help='With --batch, number of sites converted at once (default: 4)')
     parser.add_argument('--max-depth', '-d', type=int, help='Maximum depth of sub-pages to crawl (default: no limit)')
     parser.add_argument('--gemini-key', '-g', help='Google Gemini API key for content cleanup')
+    parser.add_argument('--concurrency', '-c', type=int, default=4, help='Number of pages fetched concurrently (default: 4)')
+    parser.add_argument('--max-rps', type=float, default=5.0, help='Maximum requests per second per host (default: 5)')
+    parser.add_argument('--host-concurrency', type=int, default=4, help='Maximum concurrent requests per host (default: 4)')
+    parser.add_argument('--adaptive', action='store_true', help='Tune each host\'s request rate from its latency and 429/503 responses, starting at --max-rps')
+    parser.add_argument('--adaptive-max-rps', type=float, help='Highest rate --adaptive may ramp up to (default: 4x --max-rps)')
+    parser.add_argument('--retries', type=int, default=3, help='Retries for connection errors, timeouts, 429 and 5xx responses (default: 3)')
+    parser.add_argument('--cache-dir', help='Directory for the HTTP response cache (default: caching disabled)')
+    parser.add_argument('--cache-size', type=int, default=512, help='Maximum response cache size in MB (default: 512)')
+    parser.add_argument('--gemini-cache-dir', help='Directory for caching Gemini cleanup results (default: caching disabled)')
+    parser.add_argument('--gemini-cache-ttl', type=float, default=30, help='Days before cached Gemini results expire (default: 30)')
+    parser.add_argument('--gemini-concurrency', type=int, default=4, help='Maximum concurrent Gemini requests (default: 4)')
+    parser.add_argument('--gemini-rpm', type=float, default=60, help='Maximum Gemini requests per minute (default: 60)')
+    parser.add_argument('--compress', choices=['gzip', 'zstd'], help='Compress the output file (zstd requires the zstandard package)')
+    parser.add_argument('--parser', choices=PARSER_BACKENDS, default='html.parser', help='HTML parser backend; lxml and selectolax fall back to html.parser when not installed')
+    parser.add_argument('--workers', '-w', type=int, help='Render pages in this many worker processes (default: render in the fetch threads)')
+    parser.add_argument('--incremental', action='store_true', help='Reuse sections of unchanged pages from the previous run\'s manifest')
+    parser.add_argument('--sitemap', action='store_true', help='Queue every page listed in the site\'s sitemaps before crawling')
+    parser.add_argument('--sitemap-only', action='store_true', help='Only convert pages listed in the sitemaps, without following links')
+    parser.add_argument('--bloom-error-rate', type=float, help='Track visited URLs in a Bloom filter with this false-positive rate (default: exact hashed set)')
+    parser.add_argument('--bloom-capacity', type=int, default=1_000_000, help='Number of URLs the Bloom filter is sized for (default: 1000000)')
+    parser.add_argument('--split-dir', help='Write one markdown file per page into this directory, mirroring the URL paths, with an index.jsonl and toc.md')
+    parser.add_argument('--combine', action='store_true', help='With --split-dir, also concatenate the page files into the single output file at the end')
+    parser.add_argument('--dedupe', action='store_true', help='Replace pages with the same or nearly the same content as an earlier page by a reference to it')
+    parser.add_argument('--dedupe-threshold', type=float, default=0.85, help='With --dedupe, minimum estimated Jaccard similarity of word 3-shingles for a near duplicate (default: 0.85)')
+    parser.add_argument('--trace', help='Append a JSON line with per-stage timings for every page to this file')
+    parser.add_argument('--profile-url', help='Run cProfile while converting this page and print the hottest functions')
+    parser.add_argument('--resume', action='store_true', help='Continue an interrupted crawl from its last checkpoint')
+    parser.add_argument('--checkpoint-interval', type=int, default=50, help='Pages between crawl checkpoints, 0 disables checkpointing (default: 50)')
     args = parser.parse_args()
+    if args.resume and args.compress and not args.split_dir:
+        parser.error('--resume requires uncompressed output or --split-dir')
+    if args.combine and not args.split_dir:
+        parser.error('--combine requires --split-dir')
+    if args.compress and args.split_dir and not args.combine:
+        parser.error('--compress only applies to the combined file, add --combine to use it with --split-dir')
+    if not 0 < args.dedupe_threshold <= 1:
+        parser.error('--dedupe-threshold must be greater than 0 and at most 1')
+    if bool(args.url) == bool(args.batch):
+        parser.error('give either a URL or --batch FILE')
+    if args.batch and (args.workers or args.trace or args.profile_url):
+        parser.error('--workers, --trace and --profile-url are not supported with --batch')
     
-    converter = DocsConverter(
-        args.url, 
+    # Settings shared by single-site and batch runs
+    options = dict(
         max_depth=args.max_depth,
-        gemini_api_key=args.gemini_key
+        gemini_api_key=args.gemini_key,
+        concurrency=args.concurrency,
+        max_rps=args.max_rps,
+        host_concurrency=args.host_concurrency,
+        cache_dir=args.cache_dir,
+        cache_max_bytes=args.cache_size * 1024 * 1024,
+        incremental=args.incremental,
+        gemini_cache_dir=args.gemini_cache_dir,
+        gemini_cache_ttl=args.gemini_cache_ttl * 24 * 3600,
+        gemini_concurrency=args.gemini_concurrency,
+        gemini_rpm=args.gemini_rpm,
+        compression=args.compress,
+        parser_backend=args.parser,
+        checkpoint_interval=args.checkpoint_interval,
+        sitemap=args.sitemap or args.sitemap_only,
+        follow_links=not args.sitemap_only,
+        bloom_error_rate=args.bloom_error_rate,
+        bloom_capacity=args.bloom_capacity,
+        max_retries=args.retries,
+        adaptive_rate=args.adaptive,
+        adaptive_max_rps=args.adaptive_max_rps,
+        dedupe=args.dedupe,
+        dedupe_threshold=args.dedupe_threshold,
+        split_dir=args.split_dir,
+        combine_split=args.combine
+    )
+    
+    if args.batch:
+        try:
+            sites = read_site_list(args.batch)
+        except ValueError as e:
+            parser.error(str(e))
+        batch = BatchConverter(sites, output_dir=args.output_dir, site_concurrency=args.site_concurrency, **options)
+        print(f"Converting {len(sites)} sites, {batch.site_concurrency} at a time, into {args.output_dir}")
+        results = batch.run(resume=args.resume)
+        print()
+        for result in results:
+            line = f"{result['status']:<12}{result['pages']:>7} pages  {result['url']} -> {result['output']}"
+            print(line + (f" ({result['error']})" if result.get('error') else ''))
+        print(f"\nSummary saved to: {batch.output_dir / batch.SUMMARY_NAME}")
+        return
+    
+    converter = DocsConverter(
+        args.url,
+        workers=args.workers,
+        trace_path=args.trace,
+        profile_url=args.profile_url,
+        **options
     )
-    converter.convert_all_docs()
+    converter.convert_all_docs(resume=args.resume)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
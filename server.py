@@ -1,12 +1,30 @@
 import sys
 import os
+import atexit
+import json
+import shutil
+import tempfile
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
 from flask_cors import CORS
-from docs_converter import DocsConverter
+from docs_converter import CrawlMetrics, DocsConverter, create_session
 
 app = Flask(__name__)
 
+MAX_CONVERSION_WORKERS = int(os.environ.get('MAX_CONVERSION_WORKERS', 4))
+MAX_QUEUED_JOBS = int(os.environ.get('MAX_QUEUED_JOBS', 100))
+JOB_RETENTION_SECONDS = int(os.environ.get('JOB_RETENTION_SECONDS', 3600))
+JOB_RESULTS_MAX_BYTES = int(os.environ.get('JOB_RESULTS_MAX_BYTES', 1024 * 1024 * 1024))
+RESULT_CHUNK_SIZE = 64 * 1024
+RESULT_CACHE_TTL = int(os.environ.get('RESULT_CACHE_TTL', 900))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+SERVER_MAX_DEPTH = 1  # Conversions always crawl one level below the base URL
+
 # Configure CORS with explicit headers
 CORS(app, resources={
     r"/*": {
@@ -23,67 +41,341 @@ def after_request(response):
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     return response
 
-@app.route('/', methods=['GET', 'POST'])
-def index():
-    if request.method == 'GET':
-        return render_template('index.html')
+class ResultCache:
+    """In-memory cache of converted documents with a TTL, a size cap and single-flight coalescing.
+
+    Concurrent requests for the same key wait on the one conversion already running
+    instead of starting their own.
+    """
+
+    def __init__(self, ttl=RESULT_CACHE_TTL, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(url, max_depth, gemini_enabled):
+        return (DocsConverter.normalize_url(url), max_depth, bool(gemini_enabled))
+
+    def _lookup(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        markdown, stored_at = entry
+        if time.time() - stored_at > self.ttl:
+            self._evict(key)
+            return None
+        self.entries.move_to_end(key)
+        return markdown
+
+    def _evict(self, key):
+        markdown, _ = self.entries.pop(key)
+        self.total_bytes -= len(markdown)
+
+    def _store(self, key, markdown):
+        if len(markdown) > self.max_bytes:
+            return
+        if key in self.entries:
+            self._evict(key)
+        self.entries[key] = (markdown, time.time())
+        self.total_bytes += len(markdown)
+        while self.total_bytes > self.max_bytes:
+            self._evict(next(iter(self.entries)))
+
+    def get_or_convert(self, key, convert):
+        """Return the cached document for key, running `convert()` at most once at a time per key."""
+        with self.lock:
+            markdown = self._lookup(key)
+            if markdown is not None:
+                self.hits += 1
+                return markdown
+            flight = self.in_flight.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = self.in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return flight.result()
+
+        try:
+            markdown = convert()
+        except BaseException as e:
+            # Followers must always be woken, even when the leader is torn down by
+            # SystemExit or KeyboardInterrupt, which they get as an ordinary error
+            error = e if isinstance(e, Exception) else RuntimeError(f"Conversion aborted: {e!r}")
+            with self.lock:
+                del self.in_flight[key]
+            flight.set_exception(error)
+            raise
         
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({
-                'error': 'Invalid request',
-                'details': 'Request body must be valid JSON'
-            }), 400
+        with self.lock:
+            del self.in_flight[key]
+            if markdown:
+                self._store(key, markdown)
+        flight.set_result(markdown)
+        return markdown
 
-        url = data.get('url')
-        gemini_api_key = data.get('geminiApiKey')
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hitRate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'maxBytes': self.max_bytes,
+                'inFlight': len(self.in_flight),
+            }
 
-        if not url:
-            return jsonify({
-                'error': 'URL is required',
-                'example': {
-                    'url': "https://docs.example.com/",
-                    'geminiApiKey': "optional-api-key"
-                }
-            }), 400
+results = ResultCache()
+# Totals of every conversion this process runs, each conversion also keeps its own
+metrics = CrawlMetrics()
+# One connection pool for all conversions, so repeated crawls of a site reuse connections
+session = create_session(pool_maxsize=4 * MAX_CONVERSION_WORKERS)
+
+class ConversionJob:
+    """A documentation conversion running on the worker pool, with progress for subscribers."""
+
+    def __init__(self, url, gemini_api_key=None):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.gemini_api_key = gemini_api_key
+        self.cache_key = ResultCache.make_key(url, SERVER_MAX_DEPTH, gemini_api_key)
+        self.status = 'queued'
+        self.progress = {'pages_fetched': 0, 'pages_converted': 0, 'queue_depth': 0}
+        self.result_path = None  # UTF-8 markdown spilled to disk, None once dropped
+        self.result_size = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.version = 0
+        self.changed = threading.Condition()
+
+    def update(self, **fields):
+        with self.changed:
+            for key, value in fields.items():
+                setattr(self, key, value)
+            self.version += 1
+            self.changed.notify_all()
 
-        # Validate URL format
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        return {
+            'jobId': self.id,
+            'url': self.url,
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'resultSize': self.result_size if self.result_path else None,
+        }
+
+class JobManager:
+    """Runs conversion jobs on a bounded worker pool and keeps finished jobs for a while.
+
+    Results are written to files in `result_dir` rather than kept in memory. Finished
+    jobs are dropped after `retention` seconds, and the oldest results are deleted
+    earlier when they take more than `max_result_bytes` on disk.
+    """
+
+    def __init__(self, max_workers=MAX_CONVERSION_WORKERS, max_queued=MAX_QUEUED_JOBS,
+                 retention=JOB_RETENTION_SECONDS, max_result_bytes=JOB_RESULTS_MAX_BYTES, result_dir=None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.max_queued = max_queued
+        self.retention = retention
+        self.max_result_bytes = max_result_bytes
+        if result_dir is None:
+            result_dir = tempfile.mkdtemp(prefix='docs_converter_results_')
+            atexit.register(shutil.rmtree, result_dir, True)
+        self.result_dir = result_dir
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def queue_depth(self):
+        with self.lock:
+            return sum(1 for job in self.jobs.values() if job.status == 'queued')
+
+    def jobs_ahead(self, job):
+        """Return how many queued jobs were submitted before `job`, the pool runs them first."""
+        with self.lock:
+            return sum(1 for other in self.jobs.values()
+                       if other.status == 'queued' and other.created_at < job.created_at)
+
+    def status_counts(self):
+        counts = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0}
+        with self.lock:
+            for job in self.jobs.values():
+                counts[job.status] += 1
+        return counts
+
+    def submit(self, url, gemini_api_key=None):
+        """Queue a conversion, returning None when the queue is full.
+
+        An identical conversion that is already queued or running is returned instead of
+        starting a new one.
+        """
+        self.prune()
+        job = ConversionJob(url, gemini_api_key)
+        with self.lock:
+            for active in self.jobs.values():
+                if active.cache_key == job.cache_key and not active.finished:
+                    return active
+            if sum(1 for active in self.jobs.values() if active.status == 'queued') >= self.max_queued:
+                return None
+            self.jobs[job.id] = job
+        self.executor.submit(self.run, job)
+        return job
+
+    def get(self, job_id):
+        # Status polls also prune, so an idle server still frees expired results
+        self.prune()
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def prune(self):
+        """Forget jobs past their retention and delete results beyond the byte budget, oldest first."""
+        cutoff = time.time() - self.retention
+        expired = []
+        with self.lock:
+            for job_id in [job_id for job_id, job in self.jobs.items()
+                           if job.finished and job.finished_at < cutoff]:
+                expired.append(self.jobs.pop(job_id))
+            stored = sorted((job for job in self.jobs.values() if job.result_path), key=lambda job: job.finished_at)
+            total = sum(job.result_size for job in stored)
+            for job in stored:
+                if total <= self.max_result_bytes:
+                    break
+                total -= job.result_size
+                expired.append(job)
+            paths = [job.result_path for job in expired if job.result_path]
+            for job in expired:
+                job.result_path = None
+        for path in paths:
+            # Downloads in progress keep their open file on POSIX
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def store_result(self, job, markdown):
+        """Write a finished job's markdown to disk and return its path and size in bytes."""
+        path = os.path.join(self.result_dir, f"{job.id}.md")
+        data = markdown.encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path, len(data)
+
+    def run(self, job):
+        job.update(status='running')
         try:
-            from urllib.parse import urlparse
-            parsed = urlparse(url)
-            if not all([parsed.scheme, parsed.netloc]):
-                return jsonify({
-                    'error': 'Invalid URL',
-                    'details': 'URL must include protocol (e.g., https://) and domain'
-                }), 400
-            if parsed.scheme not in ['http', 'https']:
-                return jsonify({
-                    'error': 'Invalid URL',
-                    'details': 'Only HTTP and HTTPS protocols are supported'
-                }), 400
-        except Exception:
-            return jsonify({
+            converter = DocsConverter(
+                base_url=job.url,
+                max_depth=SERVER_MAX_DEPTH,
+                gemini_api_key=job.gemini_api_key,
+                progress_callback=lambda progress: job.update(progress=progress),
+                line_post_processing=True,
+                metrics=CrawlMetrics(parent=metrics),
+                session=session
+            )
+            markdown = results.get_or_convert(job.cache_key, converter.convert)
+            if not markdown:
+                job.update(status='failed', finished_at=time.time(),
+                           error='Could not fetch or process the documentation')
+            else:
+                path, size = self.store_result(job, markdown)
+                job.update(status='done', finished_at=time.time(), result_path=path, result_size=size)
+        except Exception as e:
+            job.update(status='failed', finished_at=time.time(), error=str(e))
+        self.prune()
+
+jobs = JobManager()
+
+def parse_conversion_request():
+    """Validate a conversion request body, returning (url, gemini_api_key, error_response)."""
+    data = request.get_json()
+    if not data:
+        return None, None, (jsonify({
+            'error': 'Invalid request',
+            'details': 'Request body must be valid JSON'
+        }), 400)
+
+    url = data.get('url')
+    gemini_api_key = data.get('geminiApiKey')
+
+    if not url:
+        return None, None, (jsonify({
+            'error': 'URL is required',
+            'example': {
+                'url': "https://docs.example.com/",
+                'geminiApiKey': "optional-api-key"
+            }
+        }), 400)
+
+    # Validate URL format
+    try:
+        from urllib.parse import urlparse
+        parsed = urlparse(url)
+        if not all([parsed.scheme, parsed.netloc]):
+            return None, None, (jsonify({
                 'error': 'Invalid URL',
-                'details': 'Could not parse the provided URL'
-            }), 400
+                'details': 'URL must include protocol (e.g., https://) and domain'
+            }), 400)
+        if parsed.scheme not in ['http', 'https']:
+            return None, None, (jsonify({
+                'error': 'Invalid URL',
+                'details': 'Only HTTP and HTTPS protocols are supported'
+            }), 400)
+    except Exception:
+        return None, None, (jsonify({
+            'error': 'Invalid URL',
+            'details': 'Could not parse the provided URL'
+        }), 400)
 
-        # Validate Gemini API key if provided
-        if gemini_api_key:
-            if not isinstance(gemini_api_key, str) or len(gemini_api_key) < 10:
-                return jsonify({
-                    'error': 'Invalid Gemini API key',
-                    'details': 'API key must be a valid string'
-                }), 400
+    # Validate Gemini API key if provided
+    if gemini_api_key:
+        if not isinstance(gemini_api_key, str) or len(gemini_api_key) < 10:
+            return None, None, (jsonify({
+                'error': 'Invalid Gemini API key',
+                'details': 'API key must be a valid string'
+            }), 400)
+
+    return url, gemini_api_key, None
+
+@app.route('/', methods=['GET', 'POST'])
+def index():
+    if request.method == 'GET':
+        return render_template('index.html')
+        
+    try:
+        url, gemini_api_key, error = parse_conversion_request()
+        if error:
+            return error
 
         converter = DocsConverter(
             base_url=url,
-            max_depth=1,  # Always set to 1
-            gemini_api_key=gemini_api_key
+            max_depth=SERVER_MAX_DEPTH,
+            gemini_api_key=gemini_api_key,
+            line_post_processing=True,
+            metrics=CrawlMetrics(parent=metrics),
+            session=session
         )
         
         try:
-            markdown = converter.convert()
+            cache_key = ResultCache.make_key(url, SERVER_MAX_DEPTH, gemini_api_key)
+            markdown = results.get_or_convert(cache_key, converter.convert)
             if not markdown:
                 return jsonify({
                     'error': 'Failed to convert documentation',
@@ -103,5 +395,142 @@ def index():
             'details': str(e)
         }), 500
 
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    try:
+        url, gemini_api_key, error = parse_conversion_request()
+        if error:
+            return error
+
+        job = jobs.submit(url, gemini_api_key)
+        if not job:
+            return jsonify({
+                'error': 'Server busy',
+                'details': 'Too many conversions are queued, try again later'
+            }), 503
+
+        return jsonify(job.to_dict()), 202
+
+    except Exception as e:
+        return jsonify({
+            'error': 'Server error',
+            'details': str(e)
+        }), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def stream():
+        version = -1
+        while True:
+            with job.changed:
+                if job.version == version:
+                    job.changed.wait(timeout=15)
+                changed = job.version != version
+                version = job.version
+                state = job.to_dict()
+            if not changed:
+                # Keep idle connections alive through proxies
+                yield ': keep-alive\n\n'
+                continue
+            state['serverQueueDepth'] = jobs.queue_depth()
+            state['jobsAhead'] = jobs.jobs_ahead(job)
+            finished = state['status'] in ('done', 'failed')
+            event = state['status'] if finished else 'progress'
+            yield f"event: {event}\ndata: {json.dumps(state)}\n\n"
+            if finished:
+                return
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status == 'failed':
+        return jsonify({
+            'error': 'Failed to convert documentation',
+            'details': job.error
+        }), 400
+    if job.status != 'done':
+        return jsonify(job.to_dict()), 409
+
+    try:
+        # Opened up front, so pruning can't delete the file under the download
+        result = open(job.result_path, 'rb') if job.result_path else None
+    except OSError:
+        result = None
+    if result is None:
+        return jsonify({
+            'error': 'Result expired',
+            'details': 'The result was dropped to free space, convert the documentation again'
+        }), 410
+    total = job.result_size
+
+    # A single chunk was requested, e.g. ?offset=0&size=65536
+    if 'offset' in request.args:
+        try:
+            offset = max(0, int(request.args['offset']))
+            size = max(1, int(request.args.get('size', RESULT_CHUNK_SIZE)))
+        except ValueError:
+            result.close()
+            return jsonify({
+                'error': 'Invalid chunk',
+                'details': 'offset and size must be integers'
+            }), 400
+        with result:
+            result.seek(offset)
+            data = result.read(size + 3)
+        # Offsets count bytes; finish the last UTF-8 character so every chunk decodes
+        end = min(size, len(data))
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end += 1
+        end += offset
+        response = Response(data[:end - offset], mimetype='text/markdown; charset=utf-8')
+        response.headers['X-Total-Size'] = str(total)
+        if end < total:
+            response.headers['X-Next-Offset'] = str(end)
+        return response
+
+    def stream():
+        with result:
+            for chunk in iter(lambda: result.read(RESULT_CHUNK_SIZE), b''):
+                yield chunk
+
+    return Response(stream(), mimetype='text/markdown; charset=utf-8', headers={
+        'Content-Disposition': 'attachment; filename=converted_docs.md'
+    })
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(results.stats())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Conversion stage timings and counters, plus job and result cache state, for Prometheus."""
+    lines = ['# TYPE docs_converter_jobs gauge']
+    lines += [f'docs_converter_jobs{{status="{status}"}} {count}' for status, count in jobs.status_counts().items()]
+    cache = results.stats()
+    for name in ('hits', 'misses', 'coalesced'):
+        lines += [f'# TYPE docs_converter_result_cache_{name}_total counter',
+                  f'docs_converter_result_cache_{name}_total {cache[name]}']
+    lines += ['# TYPE docs_converter_result_cache_bytes gauge', f"docs_converter_result_cache_bytes {cache['bytes']}"]
+    body = metrics.prometheus() + '\n'.join(lines) + '\n'
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000, debug=True)